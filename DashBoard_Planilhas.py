@@ -3,6 +3,7 @@ import plotly.express as px
 import dash
 from dash import dcc, html, Input, Output, dash_table, State
 import os
+from backend import carregar_planilha, expandir_selecao, atributos_equipamento, limites_tempo
 
 app = dash.Dash(__name__)
 
@@ -13,40 +14,6 @@ if not os.path.exists(CAMINHO_PLANILHAS):
 
 ARQUIVOS = [f for f in os.listdir(CAMINHO_PLANILHAS) if f.endswith(".xlsx")]
 
-def extrair_info(df, coluna):
-    coluna_busca = "Imagem do Equipamento Registrada em:" if coluna == "Imagem Registrada:" else coluna
-    if coluna_busca not in df.columns:
-        return pd.DataFrame()
-
-    log = df[coluna_busca].dropna().astype(str)
-    if log.empty:
-        return pd.DataFrame()
-
-    extra = log.str.extract(r"(?P<nome>.+) - (?P<datahora>\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2})")
-    extra["datahora"] = pd.to_datetime(extra["datahora"], format="%d/%m/%Y %H:%M:%S", errors="coerce")
-    extra = extra.dropna(subset=["nome", "datahora"])
-    
-    if extra.empty:
-        return pd.DataFrame()
-
-    extra["data"] = extra["datahora"].dt.normalize()
-    extra["hora"] = extra["datahora"].dt.strftime("%H:%M:%S")
-    extra["semana"] = extra["datahora"].dt.to_period("W").astype(str)
-    
-    nome_limpo = coluna.split(" [Monitoramento]")[0].strip()
-    extra["alterado_no_momento"] = "Imagem Registrada:" if "Imagem do Equipamento" in nome_limpo else nome_limpo
-    extra["index_base"] = extra.index
-    return extra
-
-COLUNAS_MULTIPLAS = [
-    "Última atualização:",
-    "Imagem Registrada:"
-] + [
-    f"({b}) Pergunta {i:02d} [Monitoramento]"
-    for b in ["PC", "CE", "DF", "DQ"]
-    for i in range(1, 32)
-]
-
 app.layout = html.Div(
     style={"fontFamily": "Arial", "padding": "20px"},
     children=[
@@ -154,20 +121,12 @@ app.layout = html.Div(
 def atualizar_limites_filtros(arquivo, n_clicks, semana_atual):
     if not arquivo: return [], None, None, None
     
-    df = pd.read_excel(os.path.join(CAMINHO_PLANILHAS, arquivo), sheet_name=0)
-    lista_dfs = [extrair_info(df, c) for c in COLUNAS_MULTIPLAS if c in df.columns or (c=="Imagem Registrada:" and "Imagem do Equipamento Registrada em:" in df.columns)]
-    lista_dfs = [d for d in lista_dfs if not d.empty]
+    df_total = carregar_planilha(arquivo)[1]
+    if df_total.empty: return [], None, None, None
     
-    if not lista_dfs: return [], None, None, None
-    
-    df_total = pd.concat(lista_dfs, ignore_index=True)
-    
-    semanas = sorted(df_total["semana"].unique())
+    # Semanas e limites do calendário direto do índice de tempo da tabela compacta
+    semanas, min_d, max_d = limites_tempo(df_total)
     options = [{"label": f"Semana {s}", "value": s} for s in semanas]
-    
-    # Define os limites do calendário baseados nos dados
-    min_d = df_total["data"].min()
-    max_d = df_total["data"].max()
 
     return options, (None if n_clicks > 0 else semana_atual), min_d, max_d
 
@@ -187,23 +146,17 @@ def atualizar_limites_filtros(arquivo, n_clicks, semana_atual):
 def atualizar_dashboard(arquivo, tipo, semana_sel, start_date, end_date, click):
     if not arquivo: return dash.no_update, [], [], "", [], [], [], [], {"display": "none"}, "Resumo", [], []
 
-    df_original = pd.read_excel(os.path.join(CAMINHO_PLANILHAS, arquivo), sheet_name=0)
-    lista_eventos = [extrair_info(df_original, c) for c in COLUNAS_MULTIPLAS if c in df_original.columns or (c=="Imagem Registrada:" and "Imagem do Equipamento Registrada em:" in df_original.columns)]
-    lista_eventos = [d for d in lista_eventos if not d.empty]
-
-    if not lista_eventos: return px.pie(title="Sem dados"), [], [], "Sem dados", [], [], [], [], {"display": "none"}, "Resumo", [], []
-
-    df_eventos = pd.concat(lista_eventos, ignore_index=True)
+    # Planilha e eventos vêm do cache do backend (sem reler o .xlsx a cada clique)
+    df_original, df_compacto = carregar_planilha(arquivo)
+    if df_compacto.empty: return px.pie(title="Sem dados"), [], [], "Sem dados", [], [], [], [], {"display": "none"}, "Resumo", [], []
     
     # --- FILTRAGEM ---
-    if semana_sel: 
-        df_eventos = df_eventos[df_eventos["semana"] == semana_sel]
-    
-    if start_date and end_date:
-        # Converter dates do componente para datetime
-        df_eventos = df_eventos[(df_eventos["data"] >= start_date) & (df_eventos["data"] <= end_date)]
+    # Semana/período filtrados na tabela compacta; data/hora em texto só para esse
+    # trecho, e o resultado fica em cache (o clique no gráfico não refaz a expansão)
+    df_eventos = expandir_selecao(arquivo, semana_sel, start_date if end_date else None, end_date if start_date else None)
     
-    df_vinculado = df_eventos.merge(df_original[["TAG"]].reset_index(), left_on="index_base", right_on="index", how="left")
+    # TAG buscada por posição na dimensão de equipamentos (index_base é a linha)
+    df_vinculado = df_eventos.assign(**atributos_equipamento(df_original, df_eventos["index_base"].to_numpy(), ["TAG"]))
 
     # Lógica de processamento (Igual à anterior, usando o df_vinculado filtrado)
     tags_data, tags_cols, tags_style = [], [], {"display": "none"}
@@ -240,7 +193,7 @@ def atualizar_dashboard(arquivo, tipo, semana_sel, start_date, end_date, click):
         soma_cols = [{"name": "", "id": "label"}, {"name": "Total Alterações", "id": "valor_alt"}, {"name": "Total Tags Únicas", "id": "valor_tags"}]
 
     elif tipo == "rosquinha_tags":
-        contagem_tags = df_vinculado.groupby("TAG").size().reset_index(name="Total").sort_values("Total", ascending=False)
+        contagem_tags = df_vinculado.groupby("TAG", observed=True).size().reset_index(name="Total").sort_values("Total", ascending=False)
         fig = px.bar(contagem_tags, x="TAG", y="Total", text="Total", title="Alterações por TAG")
         tags_data = contagem_tags.to_dict("records")
         tags_cols = [{"name": i, "id": i} for i in contagem_tags.columns]
@@ -251,14 +204,14 @@ def atualizar_dashboard(arquivo, tipo, semana_sel, start_date, end_date, click):
     data_det, cols_det, titulo_det = [], [], "Clique no gráfico para ver detalhes"
     if click:
         valor = click["points"][0].get("label") or click["points"][0].get("x")
-        if tipo == "colunas_dias": fil = df_vinculado[df_vinculado["data"].dt.strftime("%d/%m/%Y") == valor]
+        if tipo == "colunas_dias": fil = df_vinculado[df_vinculado["data"] == pd.to_datetime(valor, format="%d/%m/%Y", errors="coerce")]
         elif tipo == "colunas_tags_semana": fil = df_vinculado[df_vinculado["semana"] == valor]
         elif tipo == "rosquinha_tags": fil = df_vinculado[df_vinculado["TAG"] == valor]
         else: fil = df_vinculado[df_vinculado["nome"] == valor]
         
         if not fil.empty:
-            det = fil.merge(df_original[["TAG", "Área", "Tipo", "Sistema"]].reset_index(), left_on="index_base", right_on="index", how="left")
-            cols_det = [{"name": n, "id": i} for n, i in zip(["TAG", "Área", "Sistema", "Tipo", "Pergunta/Campo", "Data", "Hora"], ["TAG_y", "Área", "Sistema", "Tipo", "alterado_no_momento", "data", "hora"])]
+            det = fil.assign(**atributos_equipamento(df_original, fil["index_base"].to_numpy(), ["Área", "Tipo", "Sistema"]))
+            cols_det = [{"name": n, "id": i} for n, i in zip(["TAG", "Área", "Sistema", "Tipo", "Pergunta/Campo", "Data", "Hora"], ["TAG", "Área", "Sistema", "Tipo", "alterado_no_momento", "data", "hora"])]
             data_det = det.to_dict("records")
             titulo_det = f"Detalhes de: {valor}"
 
@@ -1,25 +1,58 @@
 import dash
-import pandas as pd
-import plotly.express as px
 import os
+import json
+import flask
+import threading
+import tempfile
+import plotly.express as px
+from datetime import date
+from collections import OrderedDict
+from plotly.io.json import to_json_plotly
+from urllib.parse import urlencode
 from dash import Input, Output, State, dcc
 from frontend import layout
-from backend import extrair_info, listar_arquivos, COLUNAS_MULTIPLAS, CAMINHO_PLANILHAS
+from metricas import cronometrado, medir, texto_prometheus, resumo, PAINEL_METRICAS
+from observador import iniciar_observador, estado_observador, OBSERVADOR_ATIVO
+from loja import MODO_LOJA
+from backend import (listar_arquivos, carregar_planilhas, estatisticas_cache, arquivos_selecionados, TODOS_ARQUIVOS, carregar_cubo,
+                     filtrar_cubo, resumo_semanal, resumo_diario, resumo_usuarios, resumo_tags, soma_total,
+                     detalhar_selecao, consultar_pagina, chave_arquivo, lotes_exportacao, gerar_csv, gravar_xlsx,
+                     nome_unidade, limites_tempo, datas_validas)
 
 app = dash.Dash(__name__)
 app.layout = layout
+server = app.server
+
+# Processa e pré-agrega em segundo plano as planilhas novas ou alteradas; no modo
+# leitor quem faz isso é o processo carregador (python -m observador). Só sobe no
+# processo que atende as requisições: não no pai do reloader do app.run(debug=True)
+# nem nos processos do pool, que importam este módulo como __mp_main__.
+def _iniciar_observador():
+    if OBSERVADOR_ATIVO and MODO_LOJA != "leitor": iniciar_observador()
+
+server.before_request(_iniciar_observador)
 
 # --- CALLBACKS ---
 
 @app.callback(
     [Output("arquivo_excel", "options"), Output("arquivo_excel", "value")],
-    Input("arquivo_excel", "id") # Apenas para disparar no carregamento
+    [Input("arquivo_excel", "id"), # Dispara no carregamento
+     Input("intervalo_arquivos", "n_intervals")],
+    [State("arquivo_excel", "options"), State("arquivo_excel", "value")]
 )
-def carregar_arquivos(_):
+@cronometrado("carregar_arquivos", "callback")
+def carregar_arquivos(_, n_intervals, opts_atuais, val_atual):
     arquivos = listar_arquivos()
-    val = arquivos[0] if arquivos else None
     opts = [{"label": a, "value": a} for a in arquivos]
-    return opts, val
+    if len(arquivos) > 1: opts.insert(0, {"label": "Todas as unidades", "value": TODOS_ARQUIVOS})
+    if dash.ctx.triggered_id != "intervalo_arquivos":
+        return opts, ([arquivos[0]] if arquivos else [])
+
+    # Atualização periódica: só mexe no dropdown se a pasta mudou, mantendo a seleção
+    if opts == opts_atuais: return dash.no_update, dash.no_update
+    disponiveis = {o["value"] for o in opts}
+    val = [v for v in (val_atual or []) if v in disponiveis]
+    return opts, (val if val != (val_atual or []) else dash.no_update)
 
 @app.callback(
     [Output("filtro_semana", "options"), Output("filtro_semana", "value"),
@@ -27,52 +60,342 @@ def carregar_arquivos(_):
     [Input("arquivo_excel", "value"), Input("btn_limpar_semana", "n_clicks")],
     State("filtro_semana", "value")
 )
+@cronometrado("atualizar_limites_filtros", "callback")
 def atualizar_limites_filtros(arquivo, n_clicks, semana_atual):
-    if not arquivo: return [], None, None, None
-    
-    df = pd.read_excel(os.path.join(CAMINHO_PLANILHAS, arquivo), sheet_name=0)
-    lista_dfs = [extrair_info(df, c) for c in COLUNAS_MULTIPLAS if c in df.columns or (c=="Imagem Registrada:" and "Imagem do Equipamento Registrada em:" in df.columns)]
-    lista_dfs = [d for d in lista_dfs if not d.empty]
+    arquivos = arquivos_selecionados(arquivo)
+    if not arquivos: return [], None, None, None
     
-    if not lista_dfs: return [], None, None, None
+    _, df_total = carregar_planilhas(arquivos)
+    if df_total.empty: return [], None, None, None
     
-    df_total = pd.concat(lista_dfs, ignore_index=True)
-    semanas = sorted(df_total["semana"].unique())
+    # Semanas e limites do calendário saem do índice de tempo da tabela ordenada
+    semanas, primeiro_dia, ultimo_dia = limites_tempo(df_total)
     options = [{"label": f"Semana {s}", "value": s} for s in semanas]
     
-    return options, (None if n_clicks > 0 else semana_atual), df_total["data"].min(), df_total["data"].max()
+    return options, (None if n_clicks > 0 else semana_atual), primeiro_dia, ultimo_dia
+
+# --- PIPELINE EM ETAPAS ---
+# selecionar_dados -> store_selecao (arquivos + versão + filtros)
+# agregar_dados    -> store_agregado (seleção + tipo de gráfico, soma total)
+# renderizar_grafico / paginar_* leem o store_agregado; o clique no gráfico só
+# dispara paginar_detalhes. Os stores guardam só a descrição da seleção; os DataFrames
+# ficam no servidor (cache do backend e memos abaixo, chaveados pela versão dos
+# arquivos, então uma planilha nova invalida tudo sozinha).
+
+def _tabela_resumo(tipo, cubo):
+    if tipo == "colunas_tags_semana": return resumo_semanal(cubo)
+    if tipo == "rosquinha_multi": return resumo_usuarios(cubo)
+    if tipo == "colunas_dias":
+        diario = resumo_diario(cubo)
+        diario["data_str"] = diario["data"].dt.strftime("%d/%m/%Y")
+        return diario
+    return resumo_tags(cubo)
+
+# Tabelas de resumo por (seleção, tipo), LRU por quantidade de entradas
+MAX_RESUMOS = 64
+_resumos = OrderedDict()
+_resumos_lock = threading.Lock()
+
+def _resumo_memo(arquivos, versao, semana, inicio, fim, tipo):
+    chave = (arquivos, versao, semana, inicio, fim, tipo)
+    with _resumos_lock:
+        if chave in _resumos:
+            _resumos.move_to_end(chave)
+            return _resumos[chave]
+    conferida = _versao_confere(arquivos, versao)
+    resumo_df = _tabela_resumo(tipo, filtrar_cubo(carregar_cubo(list(arquivos)), semana, inicio, fim))
+    if conferida and _versao_confere(arquivos, versao):
+        with _resumos_lock:
+            _resumos[chave] = resumo_df
+            while len(_resumos) > MAX_RESUMOS:
+                _resumos.popitem(last=False)
+    return resumo_df
+
+def _versao_arquivo(arquivo):
+    # (mtime_ns, tamanho): é o que vai para o navegador, sem o caminho no servidor
+    return chave_arquivo(arquivo)[1:]
+
+def _versao_confere(arquivos, versao):
+    # carregar_cubo/carregar_planilhas leem a versão que está no disco: se uma planilha
+    # foi trocada depois de selecionar_dados (ou durante o cálculo), o resultado é da
+    # versão nova e não pode ser guardado na chave da seleção antiga
+    try:
+        return tuple(_versao_arquivo(a) for a in arquivos) == versao
+    except OSError:
+        return False
+
+def _chave_memo(selecao):
+    return (tuple(selecao["arquivos"]), tuple(map(tuple, selecao["versao"])), selecao["semana"], selecao["inicio"], selecao["fim"])
+
+# --- CACHE DE RESPOSTAS ---
+# Saídas prontas dos callbacks (figura e páginas das tabelas já passadas a JSON),
+# chaveadas pela seleção inteira: arquivos + versão (mtime/tamanho), semana,
+# período, tipo de gráfico, valor clicado e estado da tabela. Voltar a uma visão
+# já vista não passa de novo por px.bar/px.pie nem por to_dict("records"). Quando
+# selecionar_dados vê uma versão nova de uma planilha, as respostas montadas com
+# a anterior são descartadas. Evicção LRU pelo tamanho do JSON.
+
+CACHE_RESPOSTAS_MB = int(os.environ.get("DASHBOARD_CACHE_RESPOSTAS_MB", "64"))
+
+_respostas = OrderedDict()
+_respostas_lock = threading.Lock()
+_respostas_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidacoes": 0, "bytes": 0}
+_versoes_vistas = {}
+
+def _resposta(chave, gerar):
+    with _respostas_lock:
+        item = _respostas.get(chave)
+        if item is not None:
+            _respostas.move_to_end(chave)
+            _respostas_stats["hits"] += 1
+            return item[0]
+        _respostas_stats["misses"] += 1
+    # chave = (callback, arquivos, versão, ...)
+    conferida = _versao_confere(chave[1], chave[2])
+    texto = to_json_plotly(gerar())
+    valor = json.loads(texto)
+    if not (conferida and _versao_confere(chave[1], chave[2])):
+        return valor
+    with _respostas_lock:
+        if chave not in _respostas:
+            _respostas[chave] = (valor, len(texto))
+            _respostas_stats["bytes"] += len(texto)
+        limite = CACHE_RESPOSTAS_MB * 1024 * 1024
+        while _respostas_stats["bytes"] > limite and len(_respostas) > 1:
+            _, (_, liberado) = _respostas.popitem(last=False)
+            _respostas_stats["bytes"] -= liberado
+            _respostas_stats["evictions"] += 1
+    return valor
+
+def _invalidar_respostas(arquivos, versoes):
+    with _respostas_lock:
+        mudaram = {a for a, v in zip(arquivos, versoes) if _versoes_vistas.get(a, v) != v}
+        _versoes_vistas.update(zip(arquivos, versoes))
+        if not mudaram: return
+        # chave = (callback, arquivos, versão, ...): sai tudo que usou uma das planilhas alteradas
+        for chave in [k for k in _respostas if mudaram.intersection(k[1])]:
+            _respostas_stats["bytes"] -= _respostas.pop(chave)[1]
+            _respostas_stats["invalidacoes"] += 1
+
+def estatisticas_respostas():
+    with _respostas_lock:
+        total = _respostas_stats["hits"] + _respostas_stats["misses"]
+        return {**_respostas_stats, "entradas": len(_respostas),
+                "hit_rate": _respostas_stats["hits"] / total if total else 0.0}
+
+def _estado_tabela(pagina, page_size, sort_by, filter_query):
+    return pagina, page_size, json.dumps(sort_by or [], sort_keys=True), filter_query or ""
+
+def _pagina_atual(tabela, page_current):
+    # Mudou a seleção (e não a paginação/ordenação/filtro da própria tabela): volta à 1ª página
+    return page_current if dash.ctx.triggered_id == tabela else 0
 
 @app.callback(
-    [Output("grafico", "figure"), Output("tabela_detalhes", "data"), Output("tabela_detalhes", "columns"),
-     Output("titulo_tabela", "children"), Output("tabela_resumo_dinamico", "data"), Output("tabela_resumo_dinamico", "columns"),
-     Output("tabela_tags", "data"), Output("tabela_tags", "columns"), Output("titulo_tags", "style"),
-     Output("titulo_resumo", "children"), Output("tabela_soma_total", "data"), Output("tabela_soma_total", "columns")],
-    [Input("arquivo_excel", "value"), Input("tipo_grafico", "value"), Input("filtro_semana", "value"), 
-     Input("filtro_data_range", "start_date"), Input("filtro_data_range", "end_date"), Input("grafico", "clickData")]
+    Output("store_selecao", "data"),
+    [Input("arquivo_excel", "value"), Input("filtro_semana", "value"),
+     Input("filtro_data_range", "start_date"), Input("filtro_data_range", "end_date")]
 )
-def atualizar_dashboard(arquivo, tipo, semana_sel, start_date, end_date, click):
-    if not arquivo: return dash.no_update, [], [], "", [], [], [], [], {"display": "none"}, "Resumo", [], []
+@cronometrado("selecionar_dados", "callback")
+def selecionar_dados(arquivo, semana_sel, start_date, end_date):
+    arquivos = sorted(arquivos_selecionados(arquivo))
+    if not arquivos: return None
+    _, df_eventos = carregar_planilhas(arquivos)
+    versoes = [_versao_arquivo(a) for a in arquivos]
+    _invalidar_respostas(arquivos, versoes)
+    return {"arquivos": arquivos, "versao": [list(v) for v in versoes], "vazio": df_eventos.empty,
+            "semana": semana_sel, "inicio": start_date if end_date else None, "fim": end_date if start_date else None}
 
-    df_original = pd.read_excel(os.path.join(CAMINHO_PLANILHAS, arquivo), sheet_name=0)
-    lista_eventos = [extrair_info(df_original, c) for c in COLUNAS_MULTIPLAS if c in df_original.columns or (c=="Imagem Registrada:" and "Imagem do Equipamento Registrada em:" in df_original.columns)]
-    lista_eventos = [d for d in lista_eventos if not d.empty]
+@app.callback(
+    [Output("store_agregado", "data"), Output("tabela_soma_total", "data"), Output("tabela_soma_total", "columns")],
+    [Input("store_selecao", "data"), Input("tipo_grafico", "value")]
+)
+@cronometrado("agregar_dados", "callback")
+def agregar_dados(selecao, tipo):
+    if not selecao: return None, [], []
+    if selecao["vazio"]: return {**selecao, "tipo": tipo}, [], []
+    cubo = filtrar_cubo(carregar_cubo(selecao["arquivos"]), selecao["semana"], selecao["inicio"], selecao["fim"])
+    _resumo_memo(*_chave_memo(selecao), tipo)
+    soma_cols = [{"name": "", "id": "label"}, {"name": "Total Alterações", "id": "valor_alt"}, {"name": "Total Tags Únicas", "id": "valor_tags"}]
+    return {**selecao, "tipo": tipo}, [soma_total(cubo)], soma_cols
 
-    if not lista_eventos: return px.pie(title="Sem dados"), [], [], "Sem dados", [], [], [], [], {"display": "none"}, "Resumo", [], []
+@app.callback(
+    [Output("grafico", "figure"), Output("tabela_resumo_dinamico", "columns"),
+     Output("tabela_tags", "columns"), Output("titulo_tags", "style"), Output("titulo_resumo", "children")],
+    Input("store_agregado", "data")
+)
+@cronometrado("renderizar_grafico", "callback")
+def renderizar_grafico(agregado):
+    if not agregado: return dash.no_update, [], [], {"display": "none"}, "Resumo"
+    if agregado["vazio"]: return px.pie(title="Sem dados"), [], [], {"display": "none"}, "Resumo"
 
-    df_eventos = pd.concat(lista_eventos, ignore_index=True)
-    
-    if semana_sel: df_eventos = df_eventos[df_eventos["semana"] == semana_sel]
-    if start_date and end_date:
-        df_eventos = df_eventos[(df_eventos["data"] >= start_date) & (df_eventos["data"] <= end_date)]
-    
-    df_vinculado = df_eventos.merge(df_original[["TAG"]].reset_index(), left_on="index_base", right_on="index", how="left")
+    tipo = agregado["tipo"]
+    return _resposta(("grafico", *_chave_memo(agregado), tipo), lambda: _montar_grafico(agregado, tipo))
+
+def _montar_grafico(agregado, tipo):
+    res_df = _resumo_memo(*_chave_memo(agregado), tipo)
+    tags_cols, tags_style = [], {"display": "none"}
+    res_cols, titulo_res = [], "Resumo Diário"
+
+    with medir("figura"):
+        if tipo == "colunas_tags_semana":
+            fig = px.bar(res_df, x="semana", y="tags_unicas", text="tags_unicas", title="Tags Únicas Alteradas por Semana")
+            titulo_res = "Resumo Semanal"
+            res_cols = [{"name": n, "id": i} for n, i in zip(["Semana", "Total Alt.", "Tags Únicas", "Pessoas", "Usuários"], ["semana", "total_alteracoes", "tags_unicas", "pessoas_unicas", "usuarios"])]
+
+        elif tipo == "rosquinha_multi":
+            fig = px.pie(res_df, names="nome", values="total_alt", hole=0.4, title="Alterações por Usuário")
+            titulo_res = "Resumo Geral por Usuário"
+            res_cols = [{"name": "Nome do Usuário", "id": "nome"}, {"name": "Total de Alterações", "id": "total_alt"}, {"name": "Tags Únicas Alteradas", "id": "tags_unicas"}]
+
+        elif tipo == "colunas_dias":
+            fig = px.bar(res_df, x="data_str", y="total_alteracoes", text="total_alteracoes", title="Volume de Alterações por Dia")
+            res_cols = [{"name": n, "id": i} for n, i in zip(["Data", "Total Alt.", "Tags Únicas", "Pessoas", "Usuários"], ["data_str", "total_alteracoes", "tags_unicas", "pessoas_unicas", "usuarios"])]
+
+        else: # rosquinha_tags
+            fig = px.bar(res_df, x="TAG", y="Total", text="Total", title="Alterações por TAG")
+            tags_cols = [{"name": i, "id": i} for i in res_df.columns]
+            tags_style = {"display": "block", "marginTop": "30px"}
+
+    return fig, res_cols, tags_cols, tags_style, titulo_res
+
+@app.callback(
+    [Output("tabela_resumo_dinamico", "data"), Output("tabela_resumo_dinamico", "page_count"), Output("tabela_resumo_dinamico", "page_current")],
+    [Input("store_agregado", "data"),
+     Input("tabela_resumo_dinamico", "page_current"), Input("tabela_resumo_dinamico", "page_size"),
+     Input("tabela_resumo_dinamico", "sort_by"), Input("tabela_resumo_dinamico", "filter_query")]
+)
+@cronometrado("paginar_resumo", "callback")
+def paginar_resumo(agregado, page_current, page_size, sort_by, filter_query):
+    if not agregado or agregado["vazio"] or agregado["tipo"] == "rosquinha_tags": return [], 1, 0
+    pagina = _pagina_atual("tabela_resumo_dinamico", page_current)
+    def gerar():
+        data, paginas, _ = consultar_pagina(_resumo_memo(*_chave_memo(agregado), agregado["tipo"]), pagina, page_size, sort_by, filter_query)
+        return data, paginas, min(pagina, paginas - 1)
+    return _resposta(("resumo", *_chave_memo(agregado), agregado["tipo"], *_estado_tabela(pagina, page_size, sort_by, filter_query)), gerar)
+
+@app.callback(
+    [Output("tabela_tags", "data"), Output("tabela_tags", "page_count"), Output("tabela_tags", "page_current")],
+    [Input("store_agregado", "data"),
+     Input("tabela_tags", "page_current"), Input("tabela_tags", "page_size"),
+     Input("tabela_tags", "sort_by"), Input("tabela_tags", "filter_query")]
+)
+@cronometrado("paginar_tags", "callback")
+def paginar_tags(agregado, page_current, page_size, sort_by, filter_query):
+    if not agregado or agregado["vazio"] or agregado["tipo"] != "rosquinha_tags": return [], 1, 0
+    pagina = _pagina_atual("tabela_tags", page_current)
+    def gerar():
+        data, paginas, _ = consultar_pagina(_resumo_memo(*_chave_memo(agregado), "rosquinha_tags"), pagina, page_size, sort_by, filter_query)
+        return data, paginas, min(pagina, paginas - 1)
+    return _resposta(("tags", *_chave_memo(agregado), *_estado_tabela(pagina, page_size, sort_by, filter_query)), gerar)
+
+@app.callback(
+    [Output("tabela_detalhes", "data"), Output("tabela_detalhes", "columns"), Output("tabela_detalhes", "page_count"),
+     Output("tabela_detalhes", "page_current"), Output("titulo_tabela", "children")],
+    [Input("grafico", "clickData"),
+     Input("tabela_detalhes", "page_current"), Input("tabela_detalhes", "page_size"),
+     Input("tabela_detalhes", "sort_by"), Input("tabela_detalhes", "filter_query"), Input("store_agregado", "data")]
+)
+@cronometrado("paginar_detalhes", "callback")
+def paginar_detalhes(click, page_current, page_size, sort_by, filter_query, agregado):
+    if not agregado or agregado["vazio"] or not click: return [], [], 1, 0, "Clique no gráfico para ver detalhes"
+
+    valor = click["points"][0].get("label") or click["points"][0].get("x")
+    pagina = _pagina_atual("tabela_detalhes", page_current)
+    chave = ("detalhes", *_chave_memo(agregado), agregado["tipo"], str(valor), *_estado_tabela(pagina, page_size, sort_by, filter_query))
+    return _resposta(chave, lambda: _pagina_detalhes(agregado, valor, pagina, page_size, sort_by, filter_query))
+
+def _pagina_detalhes(agregado, valor, pagina, page_size, sort_by, filter_query):
+    det = detalhar_selecao(agregado["arquivos"], agregado["tipo"], valor, agregado["semana"], agregado["inicio"], agregado["fim"])
+    if det.empty: return [], [], 1, 0, "Clique no gráfico para ver detalhes"
+
+    cols_det = [{"name": n, "id": i} for n, i in zip(["TAG", "Área", "Sistema", "Tipo", "Pergunta/Campo", "Data", "Hora"], ["TAG", "Área", "Sistema", "Tipo", "alterado_no_momento", "data", "hora"])]
+    if "unidade" in det.columns: cols_det.insert(0, {"name": "Unidade", "id": "unidade"})
+    data, paginas, total = consultar_pagina(det[[c["id"] for c in cols_det]], pagina, page_size, sort_by, filter_query)
+    return data, cols_det, paginas, min(pagina, paginas - 1), f"Detalhes de: {valor} ({total} alterações)"
+
+# --- EXPORTAÇÃO ---
+# O botão é um link para /exportar com a seleção atual na query string; a rota
+# grava em lotes (ver backend.lotes_exportacao) sem montar o arquivo na memória.
+
+@app.callback(
+    Output("link_exportar", "href"),
+    [Input("store_selecao", "data"), Input("formato_exportacao", "value")]
+)
+@cronometrado("atualizar_link_exportacao", "callback")
+def atualizar_link_exportacao(selecao, formato):
+    if not selecao: return None
+    params = {"arquivo": selecao["arquivos"], "formato": formato}
+    for campo in ("semana", "inicio", "fim"):
+        if selecao[campo]: params[campo] = selecao[campo]
+    return "/exportar?" + urlencode(params, doseq=True)
+
+@app.server.route("/exportar")
+def exportar():
+    args = flask.request.args
+    disponiveis = set(listar_arquivos())
+    arquivos = sorted(a for a in args.getlist("arquivo") if a in disponiveis)
+    if not arquivos: flask.abort(404)
+    # Validado antes da resposta: um erro dentro do gerador sairia com o arquivo truncado
+    if not datas_validas(args.get("inicio"), args.get("fim")): flask.abort(400)
+
+    df_original, df_eventos = carregar_planilhas(arquivos)
+    lotes = lotes_exportacao(df_original, df_eventos, args.get("semana"), args.get("inicio"), args.get("fim"))
+    prefixo = nome_unidade(arquivos[0]) if len(arquivos) == 1 else "Todas as unidades"
+    nome = f"Alteracoes {prefixo} {date.today():%Y-%m-%d}"
+    formato = args.get("formato", "csv")
+
+    if formato == "xlsx":
+        fd, caminho = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        gravar_xlsx(lotes, caminho)
+        resposta = flask.send_file(caminho, as_attachment=True, download_name=f"{nome}.xlsx")
+        resposta.call_on_close(lambda: os.remove(caminho))
+        return resposta
+
+    compactar = formato == "csv.gz"
+    resposta = flask.Response(flask.stream_with_context(gerar_csv(lotes, compactar)),
+                              mimetype="application/gzip" if compactar else "text/csv")
+    resposta.headers.set("Content-Disposition", "attachment", filename=f"{nome}.csv" + (".gz" if compactar else ""))
+    return resposta
+
+# --- MÉTRICAS ---
 
-    # --- Lógica de geração de gráficos e tabelas (Simplificada para o exemplo) ---
-    # (Aqui entra o restante da lógica que você já tinha no elif tipo == ...)
-    # Vou manter a estrutura para não estender demais, mas é só colar a lógica do seu código original aqui.
+@app.server.route("/metrics")
+def metrics():
+    cache = estatisticas_cache()
+    extras = {
+        "dashboard_cache_hits_total": ("counter", "Acertos do cache de planilhas", cache["hits"]),
+        "dashboard_cache_misses_total": ("counter", "Faltas do cache de planilhas", cache["misses"]),
+        "dashboard_cache_evictions_total": ("counter", "Entradas descartadas do cache de planilhas", cache["evictions"]),
+        "dashboard_cache_bytes": ("gauge", "Memória ocupada pelo cache de planilhas", cache["bytes"]),
+    }
+    respostas = estatisticas_respostas()
+    extras.update({
+        "dashboard_respostas_hits_total": ("counter", "Acertos do cache de respostas dos callbacks", respostas["hits"]),
+        "dashboard_respostas_misses_total": ("counter", "Faltas do cache de respostas dos callbacks", respostas["misses"]),
+        "dashboard_respostas_evictions_total": ("counter", "Respostas descartadas por falta de espaço", respostas["evictions"]),
+        "dashboard_respostas_invalidacoes_total": ("counter", "Respostas descartadas por planilha alterada", respostas["invalidacoes"]),
+        "dashboard_respostas_bytes": ("gauge", "Tamanho do JSON guardado no cache de respostas", respostas["bytes"]),
+        "dashboard_respostas_hit_rate": ("gauge", "Fração de respostas servidas do cache", respostas["hit_rate"]),
+    })
+    if OBSERVADOR_ATIVO:
+        obs = estado_observador()
+        extras.update({
+            "dashboard_preaquecidas_total": ("counter", "Planilhas processadas em segundo plano", obs["preaquecidas"]),
+            "dashboard_preaquecimento_falhas_total": ("counter", "Falhas no processamento em segundo plano", obs["falhas"]),
+            "dashboard_preaquecimento_pendentes": ("gauge", "Planilhas aguardando fim da cópia", obs["pendentes"]),
+        })
+    return flask.Response(texto_prometheus(extras), mimetype="text/plain; version=0.0.4")
 
-    fig = px.bar(title="Dashboard Atualizado") # Exemplo
-    return fig, [], [], "Detalhes", [], [], [], [], {"display": "none"}, "Resumo", [], []
+if PAINEL_METRICAS:
+    @app.callback(Output("painel_metricas", "children"), Input("intervalo_metricas", "n_intervals"))
+    def atualizar_painel_metricas(_):
+        linhas = [f"{'tipo':<9} {'nome':<28} {'total':>7} {'média ms':>10} {'p50 ms':>9} {'p95 ms':>9}"]
+        for m in resumo():
+            linhas.append(f"{m['tipo']:<9} {m['nome']:<28} {m['total']:>7} {m['media_ms']:>10.1f} {m['p50_ms']:>9.1f} {m['p95_ms']:>9.1f}")
+        return "\n".join(linhas)
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    # No filho do reloader (quem atende) o pré-aquecimento começa antes do 1º acesso
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true": _iniciar_observador()
+    app.run(debug=True)
@@ -1,5 +1,18 @@
 import pandas as pd
+import numpy as np
 import os
+import re
+import json
+import tempfile
+import hashlib
+import time
+import threading
+import weakref
+import zlib
+import loja
+from collections import OrderedDict
+from operator import itemgetter
+from metricas import cronometrado, medir
 
 CAMINHO_PLANILHAS = "planilhas"
 if not os.path.exists(CAMINHO_PLANILHAS):
@@ -14,6 +27,16 @@ COLUNAS_MULTIPLAS = [
     for i in range(1, 32)
 ]
 
+# Colunas da planilha original usadas pelo dashboard (cadastro do equipamento)
+COLUNAS_EQUIPAMENTO = ["TAG", "Área", "Tipo", "Sistema"]
+
+# Cache em disco (Arrow/Feather) com os eventos já extraídos de cada planilha
+CAMINHO_CACHE = os.path.join(CAMINHO_PLANILHAS, ".cache")
+VERSAO_SIDECAR = "6"
+
+# Limite de memória do cache de planilhas já processadas (em MB)
+CACHE_MAX_MB = int(os.environ.get("DASHBOARD_CACHE_MAX_MB", "512"))
+
 def extrair_info(df, coluna):
     coluna_busca = "Imagem do Equipamento Registrada em:" if coluna == "Imagem Registrada:" else coluna
     if coluna_busca not in df.columns:
@@ -39,5 +62,1031 @@ def extrair_info(df, coluna):
     extra["index_base"] = extra.index
     return extra
 
+# --- EXTRAÇÃO EM LOTE ---
+# Mesmo conteúdo de concatenar extrair_info() de todas as COLUNAS_MULTIPLAS, mas
+# em uma única passada: as colunas são empilhadas numa série longa e o formato
+# "nome - dd/mm/aaaa HH:MM:SS" é fatiado por posição. Textos fora desse layout
+# (ex.: com quebra de linha) caem no regex original.
+#
+# A tabela de eventos é compacta: nome, semana e alterado_no_momento são
+# categóricos, index_base é int32 e só datahora guarda o instante (data e hora
+# são derivadas quando necessário; expandir_eventos() devolve o formato antigo).
+
+COLUNAS_CATEGORICAS = ["nome", "semana", "alterado_no_momento", "unidade"]
+
+RE_LOG = re.compile(r"(?P<nome>.+) - (?P<datahora>\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2})")
+RE_LOG_FIXO = r"[^\n]+ - \d\d/\d\d/\d{4} \d\d:\d\d:\d\d"
+
+def _rotulo_coluna(coluna):
+    nome_limpo = coluna.split(" [Monitoramento]")[0].strip()
+    return "Imagem Registrada:" if "Imagem do Equipamento" in nome_limpo else nome_limpo
+
+@cronometrado("extracao")
+def extrair_eventos(df):
+    logs, rotulos = [], []
+    for coluna in COLUNAS_MULTIPLAS:
+        coluna_busca = "Imagem do Equipamento Registrada em:" if coluna == "Imagem Registrada:" else coluna
+        if coluna_busca not in df.columns:
+            continue
+        log = df[coluna_busca].dropna()
+        if log.empty:
+            continue
+        logs.append(log.astype(str))
+        rotulos.append((_rotulo_coluna(coluna), len(log)))
+    if not logs:
+        return pd.DataFrame()
+
+    log = pd.concat(logs)
+    index_base = log.index.to_numpy()
+    log = log.reset_index(drop=True)
+    alterado = np.repeat([r for r, _ in rotulos], [n for _, n in rotulos])
+
+    texto_datahora = log.str[-19:]
+    nome = log.str[:-22]
+    # Layout fixo: nome (sem quebra de linha) + " - dd/mm/aaaa HH:MM:SS" no fim, com
+    # os dígitos e separadores no lugar (com strings pyarrow o regex roda no RE2)
+    fixo = log.str.fullmatch(RE_LOG_FIXO)
+    if not fixo.all():
+        extra = log[~fixo].str.extract(RE_LOG)
+        nome = nome.where(fixo, extra["nome"])
+        texto_datahora = texto_datahora.where(fixo, extra["datahora"])
+
+    # dd/mm/aaaa HH:MM:SS -> aaaa-mm-ddTHH:MM:SS: nesse formato exato o pandas usa o
+    # parser ISO, bem mais rápido que o strptime (e não aceita fuso nem variações)
+    t = texto_datahora
+    datahora = pd.to_datetime(t.str[6:10] + "-" + t.str[3:5] + "-" + t.str[0:2] + "T" + t.str[11:19], format="%Y-%m-%dT%H:%M:%S", errors="coerce")
+    validos = (nome.notna() & datahora.notna()).to_numpy()
+
+    if not validos.any():
+        return pd.DataFrame()
+    datahora = datahora[validos].to_numpy()
+    # Semana calculada uma vez por dia distinto e propagada pelos códigos
+    dias, posicao_dia = np.unique(datahora.astype("datetime64[D]"), return_inverse=True)
+    semanas = pd.DatetimeIndex(dias).to_period("W").astype(str).to_numpy()
+    return pd.DataFrame({
+        "nome": pd.Categorical(nome[validos].to_numpy()),
+        "datahora": datahora,
+        "semana": pd.Categorical(semanas[posicao_dia]),
+        "alterado_no_momento": pd.Categorical(alterado[validos]),
+        "index_base": index_base[validos].astype(np.int32),
+    })
+
+def expandir_eventos(eventos):
+    # Formato de extrair_info(): colunas de texto, data/hora materializadas e index_base int64
+    if eventos.empty:
+        return pd.DataFrame()
+    return pd.DataFrame({
+        "nome": eventos["nome"].astype(str),
+        "datahora": eventos["datahora"],
+        "data": eventos["datahora"].dt.normalize(),
+        "hora": eventos["datahora"].dt.strftime("%H:%M:%S"),
+        "semana": eventos["semana"].astype(str),
+        "alterado_no_momento": eventos["alterado_no_momento"].astype(str),
+        "index_base": eventos["index_base"].astype(np.int64),
+    })
+
+def _alinhar_categorias(frames, colunas=COLUNAS_CATEGORICAS):
+    # Concatenar categóricos com categorias diferentes vira object; unifica antes
+    for coluna in colunas:
+        presentes = [f for f in frames if coluna in f.columns]
+        if not presentes:
+            continue
+        categorias = presentes[0][coluna].cat.categories
+        for f in presentes[1:]:
+            if not f[coluna].cat.categories.equals(categorias):
+                categorias = categorias.union(f[coluna].cat.categories)
+        for f in presentes:
+            if not f[coluna].cat.categories.equals(categorias):
+                f[coluna] = f[coluna].cat.set_categories(categorias)
+    return frames
+
+# --- DIMENSÃO DE EQUIPAMENTOS ---
+# Uma tabela por planilha: a posição da linha é a chave (o index_base dos
+# eventos) e a TAG é categórica. Os atributos do cadastro são buscados por
+# posição (take) só quando precisam aparecer, sem merge com o cadastro.
+
+def dimensao_equipamentos(df):
+    equip = df.reindex(columns=COLUNAS_EQUIPAMENTO).reset_index(drop=True)
+    equip["TAG"] = equip["TAG"].astype("category")
+    return equip
+
+def atributos_equipamento(df_equip, index_base, colunas=COLUNAS_EQUIPAMENTO):
+    posicoes = np.asarray(index_base)
+    return {c: df_equip[c].array.take(posicoes) for c in colunas}
+
+def linhas_da_tag(df_equip, tag):
+    # Máscara por linha do cadastro, comparando o código da categoria
+    tags = df_equip["TAG"].astype("category")
+    if tag not in tags.cat.categories:
+        return np.zeros(len(df_equip), dtype=bool)
+    return tags.cat.codes.to_numpy() == tags.cat.categories.get_loc(tag)
+
 def listar_arquivos():
-    return [f for f in os.listdir(CAMINHO_PLANILHAS) if f.endswith(".xlsx")]
\ No newline at end of file
+    return [f for f in os.listdir(CAMINHO_PLANILHAS) if f.endswith(".xlsx")]
+
+# --- CACHE DE PLANILHAS PROCESSADAS ---
+# Chave: (caminho, mtime, tamanho). Se o arquivo for substituído a chave muda e a
+# versão antiga é descartada. Evicção LRU pelo total de memória ocupada.
+
+_cache_planilhas = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+# Chaves sendo carregadas agora (request, outro worker thread ou pré-aquecimento):
+# quem chega depois espera o evento em vez de ler a mesma planilha de novo
+_em_carga = {}
+
+def _chave_caminho(caminho):
+    st = os.stat(caminho)
+    return (caminho, st.st_mtime_ns, st.st_size)
+
+def chave_arquivo(arquivo):
+    return _chave_caminho(os.path.abspath(os.path.join(CAMINHO_PLANILHAS, arquivo)))
+
+def _memoria_frames(valor):
+    frames = valor.values() if isinstance(valor, dict) else valor
+    return sum(int(d.memory_usage(index=True, deep=True).sum()) for d in frames)
+
+# --- LEITURA PROJETADA DA PLANILHA ---
+# Só as colunas usadas pelo dashboard são materializadas. Com python-calamine
+# instalado o pandas usa esse motor; caso contrário o openpyxl é percorrido em
+# modo read-only, linha a linha, guardando apenas as colunas necessárias.
+
+def colunas_usadas():
+    colunas = list(COLUNAS_EQUIPAMENTO)
+    for coluna in COLUNAS_MULTIPLAS:
+        colunas.append("Imagem do Equipamento Registrada em:" if coluna == "Imagem Registrada:" else coluna)
+    return colunas
+
+def _tem_calamine():
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def _ler_openpyxl(caminho, necessarias):
+    import openpyxl
+    wb = openpyxl.load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        linhas = wb.worksheets[0].iter_rows(values_only=True)
+        cabecalho = next(linhas, None) or ()
+        posicoes = {}
+        for i, nome in enumerate(cabecalho):
+            if nome is not None and str(nome) in necessarias and str(nome) not in posicoes:
+                posicoes[str(nome)] = i
+        if not posicoes:
+            return pd.DataFrame()
+        nomes = list(posicoes)
+        largura = max(posicoes.values()) + 1
+        pegar = itemgetter(*posicoes.values())
+        vazia = (None,) * len(nomes)
+        dados = []
+        for linha in linhas:
+            if len(linha) < largura:
+                linha = tuple(linha) + (None,) * (largura - len(linha))
+            valores = pegar(linha)
+            dados.append(valores if len(nomes) > 1 else (valores,))
+    finally:
+        wb.close()
+    # Assim como o read_excel, descarta linhas vazias no fim da planilha
+    while dados and dados[-1] == vazia:
+        dados.pop()
+    return pd.DataFrame(dados, columns=nomes)
+
+@cronometrado("leitura_xlsx")
+def ler_planilha(caminho):
+    necessarias = set(colunas_usadas())
+    if _tem_calamine():
+        return pd.read_excel(caminho, sheet_name=0, engine="calamine", usecols=lambda c: c in necessarias)
+    return _ler_openpyxl(caminho, necessarias)
+
+# --- CACHE EM DISCO (SIDECAR) ---
+# Arquivos Feather por planilha (eventos, equipamentos e impressões das linhas),
+# lidos via memory-map. A validade é conferida pelo mtime/tamanho da planilha de
+# origem gravados nos metadados; se só o mtime mudou (cópia idêntica) o hash do
+# conteúdo decide. Um sidecar vencido ainda serve de versão anterior para o
+# reprocessamento incremental.
+
+def _hash_arquivo(caminho):
+    h = hashlib.sha1()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+def _caminhos_sidecar(caminho):
+    base = os.path.join(CAMINHO_CACHE, os.path.basename(caminho))
+    return base + ".eventos.feather", base + ".equip.feather", base + ".linhas.feather", base + ".meta.json"
+
+def _ler_meta_sidecar(caminho):
+    try:
+        with open(_caminhos_sidecar(caminho)[3], encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("versao") == VERSAO_SIDECAR else None
+
+def _ler_frames_sidecar(caminho, com_impressoes=False):
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        return None
+    arq_eventos, arq_equip, arq_linhas, _ = _caminhos_sidecar(caminho)
+    arquivos = [arq_equip, arq_eventos] + ([arq_linhas] if com_impressoes else [])
+    try:
+        frames = [feather.read_table(a, memory_map=True).to_pandas() for a in arquivos]
+    except (OSError, ValueError):
+        return None
+    if com_impressoes:
+        frames[2] = frames[2]["impressao"].to_numpy()
+    return tuple(frames)
+
+@cronometrado("leitura_sidecar")
+def _ler_sidecar(chave):
+    meta = _ler_meta_sidecar(chave[0])
+    if meta is None or meta.get("tamanho") != chave[2]:
+        return None
+    if meta.get("mtime_ns") != chave[1] and meta.get("sha1") != _hash_arquivo(chave[0]):
+        return None
+    return _ler_frames_sidecar(chave[0])
+
+def _gravar_sidecar(chave, df_equip, df_eventos, impressoes):
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        return
+    arq_eventos, arq_equip, arq_linhas, arq_meta = _caminhos_sidecar(chave[0])
+    try:
+        sha1 = _hash_arquivo(chave[0])
+        # Planilha trocada durante o processamento: o hash já é da versão nova e
+        # não pode ser gravado junto com os eventos da anterior
+        if _chave_caminho(chave[0]) != chave:
+            return
+        os.makedirs(CAMINHO_CACHE, exist_ok=True)
+        # Grava em temporários de nome único (vários threads/processos podem gravar
+        # a mesma planilha) e troca atomicamente; o meta vai por último
+        meta = json.dumps({"versao": VERSAO_SIDECAR, "mtime_ns": chave[1], "tamanho": chave[2], "sha1": sha1})
+        gravar = [(arq_eventos, lambda f: feather.write_feather(df_eventos, f, compression="uncompressed")),
+                  (arq_equip, lambda f: feather.write_feather(df_equip, f, compression="uncompressed")),
+                  (arq_linhas, lambda f: feather.write_feather(pd.DataFrame({"impressao": impressoes}), f, compression="uncompressed")),
+                  (arq_meta, lambda f: f.write(meta.encode("utf-8")))]
+        for destino, escrever in gravar:
+            fd, temporario = tempfile.mkstemp(dir=CAMINHO_CACHE, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    escrever(f)
+                os.replace(temporario, destino)
+            except BaseException:
+                os.remove(temporario)
+                raise
+    except (OSError, ValueError):
+        pass
+
+# --- REPROCESSAMENTO INCREMENTAL ---
+# Cada linha da planilha tem uma impressão digital (hash da TAG, do cadastro e
+# das colunas de log). Quando chega uma versão nova de um arquivo que já tem
+# sidecar, as linhas com impressão conhecida reaproveitam os eventos da versão
+# anterior (só o index_base é remapeado) e apenas as linhas novas ou alteradas
+# passam pela extração. A diferença de contagens entre as versões é guardada
+# para o cubo ser atualizado sem reagrupar todos os eventos.
+
+ORDEM_ROTULOS = {_rotulo_coluna(c): i for i, c in enumerate(COLUNAS_MULTIPLAS)}
+
+_deltas_cubo = {}
+
+def impressoes_linhas(df):
+    # XOR dos hashes das células preenchidas; cada coluna usa uma chave de hash própria
+    impressoes = np.zeros(len(df), dtype=np.uint64)
+    for i, coluna in enumerate(colunas_usadas()):
+        if coluna not in df.columns:
+            continue
+        valores = df[coluna]
+        preenchidas = valores.notna().to_numpy()
+        if preenchidas.any():
+            impressoes[preenchidas] ^= pd.util.hash_pandas_object(
+                valores[preenchidas], index=False, hash_key=f"{i:016d}", categorize=False).to_numpy()
+    return impressoes
+
+def _parear_linhas(anteriores, atuais):
+    # Para cada linha atual, a linha anterior com a mesma impressão (ou -1);
+    # linhas repetidas são pareadas pela ordem de ocorrência
+    def chaves(impressoes):
+        ocorrencia = pd.Series(impressoes).groupby(impressoes).cumcount().to_numpy()
+        return pd.MultiIndex.from_arrays([impressoes, ocorrencia])
+    return chaves(anteriores).get_indexer(chaves(atuais))
+
+def _ordenar_eventos(eventos):
+    # Ordem do armazenamento: datahora e, no empate, coluna de log e linha (a
+    # mesma para a extração completa e a incremental)
+    if eventos.empty:
+        return eventos
+    rotulos = eventos["alterado_no_momento"]
+    ordem_coluna = np.asarray(rotulos.cat.categories.map(ORDEM_ROTULOS))[rotulos.cat.codes.to_numpy()]
+    ordem = np.lexsort((eventos["index_base"].to_numpy(), ordem_coluna, eventos["datahora"].to_numpy()))
+    return eventos.iloc[ordem].reset_index(drop=True)
+
+@cronometrado("extracao_incremental")
+def reaproveitar_eventos(df, impressoes, anterior):
+    equip_ant, eventos_ant, impressoes_ant = anterior
+    origem = _parear_linhas(impressoes_ant, impressoes)
+    casadas = origem >= 0
+    novos = extrair_eventos(df.iloc[np.flatnonzero(~casadas)])
+    if eventos_ant.empty:
+        mantidos = removidos = eventos_ant
+    else:
+        nova_posicao = np.full(len(impressoes_ant), -1, dtype=np.int64)
+        nova_posicao[origem[casadas]] = np.flatnonzero(casadas)
+        destino = nova_posicao[eventos_ant["index_base"].to_numpy()]
+        mantidos = eventos_ant[destino >= 0].assign(index_base=destino[destino >= 0].astype(np.int32))
+        removidos = eventos_ant[destino < 0]
+    partes = [f for f in (mantidos, novos) if not f.empty]
+    if not partes:
+        eventos = pd.DataFrame()
+    else:
+        eventos = pd.concat(_alinhar_categorias(partes), ignore_index=True)
+        for coluna in COLUNAS_CATEGORICAS:
+            if coluna in eventos.columns:
+                eventos[coluna] = eventos[coluna].cat.remove_unused_categories()
+        eventos = _ordenar_eventos(eventos)
+    return eventos, novos, removidos
+
+def _processar_planilha(caminho):
+    df = ler_planilha(caminho)
+    df_equip = dimensao_equipamentos(df)
+    impressoes = impressoes_linhas(df)
+    meta = _ler_meta_sidecar(caminho)
+    anterior = _ler_frames_sidecar(caminho, com_impressoes=True) if meta else None
+    if anterior is None:
+        return df_equip, _ordenar_eventos(extrair_eventos(df)), impressoes, None
+    df_eventos, novos, removidos = reaproveitar_eventos(df, impressoes, anterior)
+    # Contagens do cubo: + eventos novos, - eventos que saíram da planilha
+    saiu = contar_eventos(anterior[0], removidos)
+    delta = pd.concat([contar_eventos(df_equip, novos), saiu.assign(total=-saiu["total"])], ignore_index=True)
+    return df_equip, df_eventos, impressoes, ((caminho, meta["mtime_ns"], meta["tamanho"]), delta)
+
+def _registrar_processamento(chave, processado):
+    df_equip, df_eventos, impressoes, delta = processado
+    _gravar_sidecar(chave, df_equip, df_eventos, impressoes)
+    if delta is not None:
+        with _cache_lock:
+            _deltas_cubo[chave[0]] = (delta[0], chave, delta[1])
+    return df_equip, df_eventos
+
+def _cache_buscar(chave):
+    with _cache_lock:
+        item = _cache_planilhas.get(chave)
+        if item is not None:
+            _cache_planilhas.move_to_end(chave)
+            _cache_stats["hits"] += 1
+            return item[0]
+        _cache_stats["misses"] += 1
+    return None
+
+def _cache_guardar(chave, valor):
+    tamanho = _memoria_frames(valor)
+    with _cache_lock:
+        for antiga in [k for k in _cache_planilhas if k[0] == chave[0] and k != chave]:
+            _cache_stats["bytes"] -= _cache_planilhas.pop(antiga)[1]
+        if chave not in _cache_planilhas:
+            _cache_planilhas[chave] = (valor, tamanho)
+            _cache_stats["bytes"] += tamanho
+        limite = CACHE_MAX_MB * 1024 * 1024
+        while _cache_stats["bytes"] > limite and len(_cache_planilhas) > 1:
+            _, (_, liberado) = _cache_planilhas.popitem(last=False)
+            _cache_stats["bytes"] -= liberado
+            _cache_stats["evictions"] += 1
+
+# --- LOJA COMPARTILHADA (VÁRIOS WORKERS) ---
+# Com DASHBOARD_LOJA=leitor o worker não processa planilhas: anexa, sem cópia,
+# as tabelas que o processo carregador publicou em loja.py para a mesma versão
+# (mtime/tamanho) do arquivo. As planilhas pedidas juntas esperam juntas, até
+# ESPERA_LOJA segundos no total; as que não aparecerem a tempo seguem o caminho
+# normal (sidecar/processamento).
+
+COLUNAS_CONJUNTO = ("usuarios", "tags")
+
+def _versao_loja(chave):
+    return f"{chave[1]}-{chave[2]}"
+
+def publicar_planilha(arquivo):
+    # Usado pelo carregador: eventos, cadastro e cubo da versão atual do arquivo
+    chave = chave_arquivo(arquivo)
+    df_equip, df_eventos = carregar_planilha(arquivo)
+    cubo = _cubo_planilha(arquivo)
+    if chave_arquivo(arquivo) != chave:
+        return False
+    tabelas = {"equip": df_equip, "eventos": df_eventos}
+    for nome, df in cubo.items():
+        conjuntos = {c: df[c].map(lambda x: sorted(map(str, x))) for c in COLUNAS_CONJUNTO if c in df.columns}
+        tabelas["cubo_" + nome] = df.assign(**conjuntos)
+    with medir("publicacao_loja"):
+        loja.publicar(os.path.basename(chave[0]), _versao_loja(chave), tabelas)
+    return True
+
+def _anexar_da_loja(chaves):
+    # Espera as versões de todas as planilhas juntas, com um prazo só
+    limite = time.monotonic() + loja.ESPERA_LOJA
+    anexadas = {}
+    while True:
+        for chave in chaves:
+            if chave not in anexadas:
+                tabelas = loja.anexar(os.path.basename(chave[0]), _versao_loja(chave))
+                if tabelas is not None:
+                    anexadas[chave] = _montar_anexado(chave, tabelas)
+        if len(anexadas) == len(chaves) or time.monotonic() >= limite:
+            return anexadas
+        time.sleep(0.25)
+
+def _montar_anexado(chave, tabelas):
+    cubo = {}
+    for nome in ("cubo", "dias", "usuarios_dia", "tags_dia"):
+        df = tabelas["cubo_" + nome]
+        cubo[nome] = df.assign(**{c: [frozenset(x) for x in df[c]] for c in COLUNAS_CONJUNTO if c in df.columns})
+    _cache_guardar(("cubo:" + chave[0], chave), cubo)
+    return tabelas["equip"], tabelas["eventos"]
+
+def _carregar_prontos(chaves):
+    # Sem processar: loja compartilhada (modo leitor) ou sidecar
+    prontos = _anexar_da_loja(chaves) if loja.MODO_LOJA == "leitor" and chaves else {}
+    for chave in chaves:
+        if chave not in prontos:
+            prontos[chave] = _ler_sidecar(chave)
+    return prontos
+
+def carregar_planilha(arquivo):
+    chave = chave_arquivo(arquivo)
+    return _carregar_partes([chave], minimo_paralelo=2)[chave]
+
+# --- MODO CONSOLIDADO (VÁRIAS UNIDADES) ---
+# As planilhas que não estão em cache nem têm sidecar válido são processadas em
+# paralelo num pool de processos. Na união, cada evento recebe a unidade de
+# origem, o index_base é deslocado para continuar único e a TAG ganha o nome da
+# unidade como prefixo (TAGs iguais em unidades diferentes são equipamentos
+# diferentes).
+
+TODOS_ARQUIVOS = "__todos__"
+
+def nome_unidade(arquivo):
+    m = re.search(r"\(([^)]+)\)", arquivo)
+    nome = m.group(1) if m else os.path.splitext(arquivo)[0]
+    return re.sub(r"\s+\d+$", "", nome).strip()
+
+def arquivos_selecionados(valor):
+    if not valor:
+        return []
+    selecao = [valor] if isinstance(valor, str) else list(valor)
+    if TODOS_ARQUIVOS in selecao:
+        return listar_arquivos()
+    return selecao
+
+def _processar_em_paralelo(chaves, max_workers=None):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+    caminhos = [c[0] for c in chaves]
+    # Sem fork: o processo tem threads (requisições, observador) e um lock
+    # copiado no meio do uso (ex.: o de metricas) travaria o filho para sempre
+    metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    try:
+        with ProcessPoolExecutor(max_workers=min(len(caminhos), max_workers or os.cpu_count() or 1),
+                                 mp_context=multiprocessing.get_context(metodo)) as pool:
+            return list(pool.map(_processar_planilha, caminhos))
+    except (BrokenProcessPool, OSError, PermissionError):
+        return [_processar_planilha(c) for c in caminhos]
+
+def _reservar_carga(chaves):
+    # Divide as chaves entre as que este thread vai carregar e as que já estão em carga
+    minhas, alheias = [], []
+    with _cache_lock:
+        for chave in chaves:
+            if chave in _em_carga:
+                alheias.append(_em_carga[chave])
+            else:
+                _em_carga[chave] = threading.Event()
+                minhas.append(chave)
+    return minhas, alheias
+
+def _liberar_carga(chaves):
+    with _cache_lock:
+        for chave in chaves:
+            _em_carga.pop(chave).set()
+
+def _carregar_partes(chaves, minimo_paralelo=2, max_workers=None):
+    partes = {chave: _cache_buscar(chave) for chave in chaves}
+    while True:
+        faltando = [c for c in chaves if partes[c] is None]
+        if not faltando:
+            return partes
+        minhas, alheias = _reservar_carga(faltando)
+        try:
+            partes.update(_carregar_prontos(minhas))
+            pendentes = [c for c in minhas if partes[c] is None]
+            if len(pendentes) >= minimo_paralelo:
+                processados = _processar_em_paralelo(pendentes, max_workers)
+            else:
+                processados = [_processar_planilha(c[0]) for c in pendentes]
+            for chave, processado in zip(pendentes, processados):
+                partes[chave] = _registrar_processamento(chave, processado)
+            for chave in minhas:
+                _cache_guardar(chave, partes[chave])
+        finally:
+            _liberar_carga(minhas)
+        # As carregadas por outro thread vêm do cache; se falharam (ou já saíram
+        # do cache) a próxima volta reserva e carrega aqui
+        for evento in alheias:
+            evento.wait()
+        for chave in faltando:
+            if partes[chave] is None:
+                partes[chave] = _cache_buscar(chave)
+
+def carregar_planilhas(arquivos):
+    arquivos = sorted(arquivos)
+    if len(arquivos) == 1:
+        return carregar_planilha(arquivos[0])
+    if not arquivos:
+        return pd.DataFrame(columns=COLUNAS_EQUIPAMENTO), pd.DataFrame()
+
+    chaves = [chave_arquivo(a) for a in arquivos]
+    chave_total = ("consolidado:" + "|".join(c[0] for c in chaves),) + tuple(chaves)
+    carregado = _cache_buscar(chave_total)
+    if carregado is not None:
+        return carregado
+
+    partes = _carregar_partes(chaves)
+
+    lista_equip, lista_eventos, deslocamento = [], [], 0
+    for arquivo, chave in zip(arquivos, chaves):
+        df_equip, df_eventos = partes[chave]
+        unidade = nome_unidade(arquivo)
+        equip = df_equip.reset_index(drop=True)
+        equip["TAG"] = (unidade + " | " + equip["TAG"].astype(str)).where(equip["TAG"].notna())
+        equip["Unidade"] = unidade
+        lista_equip.append(equip)
+        if not df_eventos.empty:
+            eventos = df_eventos.copy()
+            eventos["index_base"] = (eventos["index_base"] + deslocamento).astype(np.int32)
+            eventos["unidade"] = pd.Categorical([unidade] * len(eventos))
+            lista_eventos.append(eventos)
+        deslocamento += len(equip)
+
+    df_equip = pd.concat(lista_equip, ignore_index=True)
+    df_equip["TAG"] = df_equip["TAG"].astype("category")
+    df_eventos = pd.concat(_alinhar_categorias(lista_eventos), ignore_index=True) if lista_eventos else pd.DataFrame()
+    if not df_eventos.empty:
+        # Cada unidade já vem em ordem de datahora; a ordenação estável intercala
+        df_eventos = df_eventos.iloc[np.argsort(df_eventos["datahora"].to_numpy(), kind="stable")].reset_index(drop=True)
+    _cache_guardar(chave_total, (df_equip, df_eventos))
+    return df_equip, df_eventos
+
+# --- CUBO DE AGREGAÇÃO ---
+# Montado uma vez por planilha (ou seleção de unidades): contagens por
+# (data, semana, nome, TAG, alterado_no_momento) e, por dia, os conjuntos de
+# usuários e TAGs distintos. Os resumos do dashboard saem do cubo filtrado por
+# semana/intervalo de datas, sem passar de novo pelos eventos.
+
+def _conjuntos_por(df, chaves, coluna, destino):
+    # Equivale a groupby(chaves)[coluna].agg(frozenset) sem o custo de um Series por grupo
+    pares = df[chaves + [coluna]].dropna(subset=[coluna]).drop_duplicates()
+    # Códigos de grupo comuns à origem e ao destino; um frozenset por fatia contígua
+    grupos = pd.concat([pares[chaves], destino[chaves]], ignore_index=True).groupby(
+        chaves, observed=True, dropna=False, sort=False).ngroup().to_numpy()
+    grupos_pares, grupos_destino = grupos[:len(pares)], grupos[len(pares):]
+    ordem = np.argsort(grupos_pares, kind="stable")
+    ids, inicios = np.unique(grupos_pares[ordem], return_index=True)
+    fatias = np.split(pares[coluna].to_numpy(dtype=object)[ordem], inicios[1:])
+    conjuntos = dict(zip(ids.tolist(), map(frozenset, fatias)))
+    vazio = frozenset()
+    return [conjuntos.get(g, vazio) for g in grupos_destino.tolist()]
+
+def _uniao(conjuntos):
+    return frozenset().union(*conjuntos)
+
+CHAVES_CUBO = ["data", "semana", "nome", "TAG", "alterado_no_momento"]
+
+def contar_eventos(df_equip, df_eventos):
+    if df_eventos.empty:
+        base = pd.DataFrame({c: pd.Categorical([]) for c in ["semana", "nome", "TAG", "alterado_no_momento"]})
+        base["data"] = pd.Series([], dtype="datetime64[us]")
+    else:
+        tags = df_equip["TAG"].astype("category")
+        base = df_eventos[["semana", "nome", "alterado_no_momento"]].assign(
+            data=df_eventos["datahora"].dt.normalize(),
+            TAG=pd.Categorical.from_codes(tags.cat.codes.to_numpy()[df_eventos["index_base"].to_numpy()], tags.cat.categories))
+    return base.groupby(CHAVES_CUBO, dropna=False, observed=True).size().rename("total").reset_index()
+
+def _concatenar_cubo(partes):
+    partes = [p.copy() for p in partes]
+    for parte in partes:
+        for coluna in CHAVES_CUBO[1:]:
+            if coluna in parte.columns and not isinstance(parte[coluna].dtype, pd.CategoricalDtype):
+                parte[coluna] = parte[coluna].astype("category")
+    return pd.concat(_alinhar_categorias(partes, CHAVES_CUBO[1:]), ignore_index=True)
+
+def somar_contagens(partes):
+    # Soma tabelas de contagem com categorias diferentes; grupos zerados somem
+    soma = _concatenar_cubo(partes).groupby(CHAVES_CUBO, dropna=False, observed=True)["total"].sum().reset_index()
+    return soma[soma["total"] != 0].reset_index(drop=True)
+
+@cronometrado("cubo")
+def montar_cubo(df_equip, df_eventos):
+    return derivar_cubo(contar_eventos(df_equip, df_eventos))
+
+def derivar_cubo(cubo):
+    dias = cubo.groupby(["data", "semana"], observed=True).agg(total=("total", "sum")).reset_index()
+    dias["usuarios"] = _conjuntos_por(cubo, ["data"], "nome", dias)
+    dias["tags"] = _conjuntos_por(cubo, ["data"], "TAG", dias)
+    usuarios_dia = cubo.groupby(["data", "semana", "nome"], observed=True).agg(total=("total", "sum")).reset_index()
+    usuarios_dia["tags"] = _conjuntos_por(cubo, ["data", "nome"], "TAG", usuarios_dia)
+    tags_dia = cubo.groupby(["data", "semana", "TAG"], observed=True).agg(total=("total", "sum")).reset_index()
+    return {"cubo": cubo, "dias": dias, "usuarios_dia": usuarios_dia, "tags_dia": tags_dia}
+
+@cronometrado("cubo_incremental")
+def atualizar_cubo(cubo, delta):
+    # Todas as tabelas do cubo são por dia: só os dias tocados pela diferença são
+    # reagrupados e entram no lugar dos antigos (a ordem por data é mantida)
+    dias = delta["data"].unique()
+    fino = cubo["cubo"]
+    parcial = derivar_cubo(somar_contagens([fino[fino["data"].isin(dias)], delta]))
+    atualizado = {}
+    for nome, df in cubo.items():
+        junto = _concatenar_cubo([df[~df["data"].isin(dias)], parcial[nome]])
+        atualizado[nome] = junto.iloc[np.argsort(junto["data"].to_numpy(), kind="stable")].reset_index(drop=True)
+    return atualizado
+
+def _cubo_planilha(arquivo):
+    chave_arq = chave_arquivo(arquivo)
+    chave = ("cubo:" + chave_arq[0], chave_arq)
+    cubo = _cache_buscar(chave)
+    while cubo is None:
+        # Como nas planilhas: se o pré-aquecimento já está montando, espera por ele
+        minhas, alheias = _reservar_carga([chave])
+        if alheias:
+            alheias[0].wait()
+            cubo = _cache_buscar(chave)
+            continue
+        try:
+            cubo = _montar_cubo_planilha(arquivo, chave_arq, chave)
+        finally:
+            _liberar_carga(minhas)
+    return cubo
+
+def _montar_cubo_planilha(arquivo, chave_arq, chave):
+    df_equip, df_eventos = carregar_planilha(arquivo)
+    with _cache_lock:
+        # Anexado da loja compartilhada junto com a planilha
+        anexado = _cache_planilhas.get(chave)
+        if anexado is not None:
+            return anexado[0]
+        delta = _deltas_cubo.pop(chave_arq[0], None)
+        anterior = _cache_planilhas.get(("cubo:" + chave_arq[0], delta[0])) if delta and delta[1] == chave_arq else None
+    if anterior is not None:
+        cubo = atualizar_cubo(anterior[0], delta[2])
+    else:
+        cubo = montar_cubo(df_equip, df_eventos)
+    _cache_guardar(chave, cubo)
+    return cubo
+
+def carregar_cubo(arquivos):
+    arquivos = sorted(arquivos)
+    if len(arquivos) == 1:
+        return _cubo_planilha(arquivos[0])
+    chaves = [chave_arquivo(a) for a in arquivos]
+    chave = ("cubo:" + "|".join(c[0] for c in chaves),) + tuple(chaves)
+    cubo = _cache_buscar(chave)
+    if cubo is None:
+        # Processa as pendentes em paralelo; o cubo consolidado soma as contagens
+        # de cada unidade com a TAG prefixada, como em carregar_planilhas()
+        carregar_planilhas(arquivos)
+        partes = []
+        for arquivo in arquivos:
+            contagem = _cubo_planilha(arquivo)["cubo"]
+            tag = contagem["TAG"]
+            partes.append(contagem.assign(TAG=(nome_unidade(arquivo) + " | " + tag.astype(str)).where(tag.notna())))
+        with medir("cubo"):
+            cubo = derivar_cubo(somar_contagens(partes))
+        _cache_guardar(chave, cubo)
+    return cubo
+
+# --- PRÉ-AQUECIMENTO ---
+# Chamado pelo observador da pasta (observador.py): as planilhas são processadas
+# num pool de processos limitado, fora do processo que atende as requisições, e
+# eventos e cubos ficam no cache antes do primeiro acesso.
+
+@cronometrado("preaquecimento")
+def preaquecer(arquivos, max_workers=None):
+    arquivos = sorted(arquivos)
+    _carregar_partes([chave_arquivo(a) for a in arquivos], 1, max_workers)
+    for arquivo in arquivos:
+        _cubo_planilha(arquivo)
+
+@cronometrado("filtro_cubo")
+def filtrar_cubo(cubo, semana=None, inicio=None, fim=None):
+    # Todas as tabelas do cubo estão ordenadas por data: semana e intervalo viram
+    # um par de dias [de, ate] e cada tabela é fatiada por busca binária
+    if not semana and not (inicio and fim):
+        return cubo
+    limites = []
+    if semana:
+        dias = cubo["dias"]["data"][cubo["dias"]["semana"] == semana]
+        if dias.empty:
+            return {nome: df.iloc[:0] for nome, df in cubo.items()}
+        limites.append((dias.iloc[0], dias.iloc[-1]))
+    if inicio and fim:
+        limites.append((pd.Timestamp(inicio).normalize(), pd.Timestamp(fim).normalize()))
+    de = np.datetime64(max(l[0] for l in limites).date(), "D")
+    ate = np.datetime64(min(l[1] for l in limites).date(), "D")
+    filtrado = {}
+    for nome, df in cubo.items():
+        datas = df["data"].to_numpy()
+        a, b = np.searchsorted(datas, de), np.searchsorted(datas, ate, "right")
+        filtrado[nome] = df.iloc[a:max(a, b)]
+    return filtrado
+
+@cronometrado("agregacao_semanal")
+def resumo_semanal(cubo):
+    semanal = cubo["dias"].groupby("semana", observed=True).agg(total_alteracoes=("total", "sum"), tags=("tags", _uniao), usuarios=("usuarios", _uniao)).reset_index()
+    semanal["tags_unicas"] = semanal["tags"].map(len)
+    semanal["pessoas_unicas"] = semanal["usuarios"].map(len)
+    semanal["usuarios"] = semanal["usuarios"].map(lambda x: ", ".join(sorted(x)))
+    semanal["semana"] = semanal["semana"].astype(str)
+    return semanal[["semana", "total_alteracoes", "tags_unicas", "pessoas_unicas", "usuarios"]]
+
+@cronometrado("agregacao_diaria")
+def resumo_diario(cubo):
+    dias = cubo["dias"]
+    return pd.DataFrame({
+        "data": dias["data"],
+        "total_alteracoes": dias["total"],
+        "tags_unicas": dias["tags"].map(len),
+        "pessoas_unicas": dias["usuarios"].map(len),
+        "usuarios": dias["usuarios"].map(lambda x: ", ".join(sorted(x))),
+    }).reset_index(drop=True)
+
+@cronometrado("agregacao_usuarios")
+def resumo_usuarios(cubo):
+    por_usuario = cubo["usuarios_dia"].groupby("nome", observed=True).agg(total_alt=("total", "sum"), tags_unicas=("tags", lambda x: len(_uniao(x)))).reset_index()
+    por_usuario["nome"] = por_usuario["nome"].astype(str)
+    return por_usuario.sort_values("total_alt", ascending=False)
+
+@cronometrado("agregacao_tags")
+def resumo_tags(cubo):
+    por_tag = cubo["tags_dia"].groupby("TAG", observed=True)["total"].sum().reset_index(name="Total")
+    por_tag["TAG"] = por_tag["TAG"].astype(str)
+    return por_tag.sort_values("Total", ascending=False)
+
+def soma_total(cubo):
+    return {"label": "SOMA TOTAL", "valor_alt": int(cubo["dias"]["total"].sum()), "valor_tags": len(_uniao(cubo["dias"]["tags"]))}
+
+# --- ÍNDICE DE TEMPO ---
+# A tabela de eventos fica ordenada por datahora. Por tabela carregada guarda-se
+# (uma vez) o deslocamento de início de cada dia e de cada semana; filtros de
+# semana e de intervalo de datas viram fatias contíguas achadas por busca
+# binária, sem varrer a tabela.
+
+_indices_tempo = {}
+
+def _montar_indice_tempo(df_eventos):
+    if df_eventos.empty:
+        return {"dias": np.array([], dtype="datetime64[D]"), "inicios": np.zeros(1, dtype=np.int64),
+                "semanas": [], "posicao_semana": {}, "inicios_semana": np.zeros(1, dtype=np.int64)}
+    datahora = df_eventos["datahora"].to_numpy()
+    if (datahora[1:] < datahora[:-1]).any():
+        raise ValueError("Tabela de eventos fora de ordem de datahora")
+    dia = datahora.astype("datetime64[D]")
+    inicios = np.flatnonzero(np.r_[True, dia[1:] != dia[:-1]])
+    # Semana de cada dia (dias da mesma semana são vizinhos na tabela ordenada)
+    semana_dia = df_eventos["semana"].to_numpy()[inicios]
+    troca = np.flatnonzero(np.r_[True, semana_dia[1:] != semana_dia[:-1]])
+    semanas = [str(s) for s in semana_dia[troca]]
+    return {"dias": dia[inicios], "inicios": np.r_[inicios, len(dia)],
+            "semanas": semanas, "posicao_semana": {s: i for i, s in enumerate(semanas)},
+            "inicios_semana": np.r_[inicios[troca], len(dia)]}
+
+def indice_tempo(df_eventos):
+    chave = id(df_eventos)
+    item = _indices_tempo.get(chave)
+    if item is not None and item[0]() is df_eventos:
+        return item[1]
+    indice = _montar_indice_tempo(df_eventos)
+    _indices_tempo[chave] = (weakref.ref(df_eventos), indice)
+    weakref.finalize(df_eventos, _indices_tempo.pop, chave, None)
+    return indice
+
+def limites_tempo(df_eventos):
+    # Opções do filtro de semana e limites do calendário, direto do índice
+    indice = indice_tempo(df_eventos)
+    if not len(indice["dias"]):
+        return [], None, None
+    return indice["semanas"], pd.Timestamp(indice["dias"][0]), pd.Timestamp(indice["dias"][-1])
+
+def _intervalo_eventos(df_eventos, semana=None, inicio=None, fim=None):
+    indice = indice_tempo(df_eventos)
+    a, b = 0, len(df_eventos)
+    if semana:
+        i = indice["posicao_semana"].get(semana)
+        if i is None:
+            return 0, 0
+        a, b = indice["inicios_semana"][i], indice["inicios_semana"][i + 1]
+    if inicio and fim:
+        # Intervalo de dias fechado: do primeiro evento de inicio ao último de fim
+        de, ate = pd.to_datetime(inicio, errors="coerce"), pd.to_datetime(fim, errors="coerce")
+        if pd.isna(de) or pd.isna(ate):
+            return 0, 0
+        dias, inicios = indice["dias"], indice["inicios"]
+        a = max(a, inicios[np.searchsorted(dias, np.datetime64(de.date(), "D"))])
+        b = min(b, inicios[np.searchsorted(dias, np.datetime64(ate.date(), "D"), "right")])
+    return int(a), int(max(a, b))
+
+def datas_validas(*datas):
+    # Datas de filtro vindas de fora (query string): vazias ou interpretáveis
+    return all(not d or not pd.isna(pd.to_datetime(d, errors="coerce")) for d in datas)
+
+def _fatiar_eventos(df_eventos, *intervalos):
+    a = max(i[0] for i in intervalos)
+    b = min(i[1] for i in intervalos)
+    return df_eventos.iloc[a:max(a, b)]
+
+def filtrar_eventos(df_eventos, semana=None, inicio=None, fim=None):
+    if not semana and not (inicio and fim):
+        return df_eventos
+    return _fatiar_eventos(df_eventos, _intervalo_eventos(df_eventos, semana, inicio, fim))
+
+# --- DETALHAMENTO E PAGINAÇÃO NO SERVIDOR ---
+# As tabelas usam page/sort/filter "custom": o navegador envia página, ordenação
+# e filter_query, e só a página visível é serializada.
+
+def detalhar_eventos(df_equip, df_eventos, tipo, valor, semana=None, inicio=None, fim=None):
+    if df_eventos.empty:
+        return pd.DataFrame()
+    selecao = _intervalo_eventos(df_eventos, semana, inicio, fim)
+    eventos = _fatiar_eventos(df_eventos, selecao)
+    # Filtra antes de buscar os atributos do cadastro (só as linhas exibidas)
+    if tipo == "colunas_dias":
+        dia = pd.to_datetime(valor, format="%d/%m/%Y", errors="coerce")
+        fil = _fatiar_eventos(df_eventos, selecao, _intervalo_eventos(df_eventos, None, dia, dia))
+    elif tipo == "colunas_tags_semana": fil = _fatiar_eventos(df_eventos, selecao, _intervalo_eventos(df_eventos, valor))
+    elif tipo == "rosquinha_tags": fil = eventos[linhas_da_tag(df_equip, valor)[eventos["index_base"].to_numpy()]]
+    else: fil = eventos[eventos["nome"] == valor]
+    with medir("juncao"):
+        det = fil.reset_index(drop=True).assign(**atributos_equipamento(df_equip, fil["index_base"].to_numpy()))
+    det["data"] = det["datahora"].dt.normalize()
+    det["hora"] = det["datahora"].dt.strftime("%H:%M:%S")
+    return det
+
+OPERADORES_FILTRO = [("ge", ">="), ("le", "<="), ("lt", "<"), ("gt", ">"), ("ne", "!="), ("eq", "="), ("contains",), ("datestartswith",)]
+
+def _partes_filtro(parte):
+    for sinonimos in OPERADORES_FILTRO:
+        for operador in sinonimos:
+            if f" {operador} " in parte:
+                nome, texto = parte.split(f" {operador} ", 1)
+                nome = nome[nome.find("{") + 1: nome.rfind("}")]
+                texto = texto.strip()
+                if len(texto) > 1 and texto[0] == texto[-1] and texto[0] in "'\"`":
+                    texto = texto[1:-1].replace("\\" + texto[0], texto[0])
+                return nome, sinonimos[0], texto
+    return None, None, None
+
+def _aplicar_filtro(df, filtro):
+    for parte in filtro.split(" && "):
+        coluna, operador, texto = _partes_filtro(parte)
+        if coluna not in df.columns:
+            continue
+        serie = df[coluna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype(str)
+        if operador == "contains":
+            mascara = serie.astype(str).str.contains(texto, case=False, regex=False)
+        elif operador == "datestartswith":
+            mascara = serie.astype(str).str.startswith(texto)
+        else:
+            if pd.api.types.is_datetime64_any_dtype(serie):
+                valor = pd.to_datetime(texto, errors="coerce", dayfirst="/" in texto)
+            elif pd.api.types.is_numeric_dtype(serie):
+                valor = pd.to_numeric(texto, errors="coerce")
+            else:
+                valor = texto
+            mascara = getattr(serie, operador)(valor)
+        df = df[mascara.fillna(False).astype(bool)]
+    return df
+
+def detalhar_selecao(arquivos, tipo, valor, semana=None, inicio=None, fim=None):
+    # detalhar_eventos guardado no cache de planilhas (limitado por memória); a
+    # chave leva a versão dos arquivos, então uma planilha nova substitui a entrada
+    arquivos = sorted(arquivos)
+    chaves = tuple(chave_arquivo(a) for a in arquivos)
+    chave = ("detalhes:" + json.dumps([[c[0] for c in chaves], tipo, str(valor), semana, inicio, fim]),) + chaves
+    carregado = _cache_buscar(chave)
+    if carregado is None:
+        carregado = (detalhar_eventos(*carregar_planilhas(arquivos), tipo, valor, semana, inicio, fim),)
+        _cache_guardar(chave, carregado)
+    return carregado[0]
+
+def expandir_selecao(arquivo, semana=None, inicio=None, fim=None):
+    # expandir_eventos só do trecho filtrado (busca binária na tabela compacta),
+    # guardado no cache de planilhas como em detalhar_selecao
+    chave_arq = chave_arquivo(arquivo)
+    chave = ("expandido:" + json.dumps([chave_arq[0], semana, inicio, fim]), chave_arq)
+    carregado = _cache_buscar(chave)
+    if carregado is None:
+        carregado = (expandir_eventos(filtrar_eventos(carregar_planilha(arquivo)[1], semana, inicio, fim)),)
+        _cache_guardar(chave, carregado)
+    return carregado[0]
+
+def consultar_pagina(df, pagina=0, tamanho=20, ordenacao=None, filtro=None):
+    if filtro:
+        df = _aplicar_filtro(df, filtro)
+    ordenacao = [o for o in (ordenacao or []) if o["column_id"] in df.columns]
+    if ordenacao:
+        df = df.sort_values([o["column_id"] for o in ordenacao], ascending=[o["direction"] == "asc" for o in ordenacao], kind="stable")
+    tamanho = max(int(tamanho or 20), 1)
+    total_paginas = max((len(df) + tamanho - 1) // tamanho, 1)
+    pagina = min(max(int(pagina or 0), 0), total_paginas - 1)
+    with medir("serializacao"):
+        registros = df.iloc[pagina * tamanho:(pagina + 1) * tamanho].to_dict("records")
+    return registros, total_paginas, len(df)
+
+# --- EXPORTAÇÃO ---
+# Os eventos filtrados são percorridos em lotes (com o cadastro do equipamento
+# anexado por posição) e gravados aos poucos: CSV/CSV.gz como gerador de bytes
+# para uma resposta em streaming, XLSX em modo de memória constante.
+
+COLUNAS_EXPORTACAO = [("unidade", "Unidade"), ("TAG", "TAG"), ("Área", "Área"), ("Tipo", "Tipo"), ("Sistema", "Sistema"),
+                      ("nome", "Usuário"), ("alterado_no_momento", "Pergunta/Campo"), ("datahora", "Data"), ("datahora", "Hora"),
+                      ("semana", "Semana")]
+LOTE_EXPORTACAO = 50_000
+LIMITE_LINHAS_XLSX = 1_048_576
+
+def lotes_exportacao(df_equip, df_eventos, semana=None, inicio=None, fim=None, tamanho_lote=LOTE_EXPORTACAO):
+    colunas = [(c, n) for c, n in COLUNAS_EXPORTACAO if c in df_eventos.columns or c in df_equip.columns]
+    a, b = _intervalo_eventos(df_eventos, semana, inicio, fim) if not df_eventos.empty else (0, 0)
+    if a == b:
+        yield pd.DataFrame(columns=[n for _, n in colunas])
+        return
+    for pos in range(a, b, tamanho_lote):
+        lote = df_eventos.iloc[pos:min(pos + tamanho_lote, b)]
+        equip = atributos_equipamento(df_equip, lote["index_base"].to_numpy(), [c for c, _ in colunas if c not in lote.columns])
+        saida = pd.DataFrame({n: (lote[c].to_numpy() if c in lote.columns else np.asarray(equip[c])) for c, n in colunas})
+        saida["Data"] = saida["Data"].dt.strftime("%d/%m/%Y")
+        saida["Hora"] = saida["Hora"].dt.strftime("%H:%M:%S")
+        yield saida
+
+def gerar_csv(lotes, compactar=False):
+    # ";" e BOM UTF-8 para o Excel em português abrir direto
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compactar else None
+    primeiro = True
+    for lote in lotes:
+        dados = lote.to_csv(sep=";", index=False, header=primeiro).encode("utf-8")
+        if primeiro: dados = "\ufeff".encode("utf-8") + dados
+        primeiro = False
+        yield compressor.compress(dados) if compressor else dados
+    if compressor:
+        yield compressor.flush()
+
+def gravar_xlsx(lotes, destino):
+    try:
+        import xlsxwriter
+    except ImportError:
+        xlsxwriter = None
+
+    if xlsxwriter is not None:
+        wb = xlsxwriter.Workbook(destino, {"constant_memory": True, "strings_to_numbers": False})
+        nova_aba = lambda: wb.add_worksheet()
+        escrever = lambda ws, linha, valores: ws.write_row(linha, 0, valores)
+    else:
+        import openpyxl
+        wb = openpyxl.Workbook(write_only=True)
+        nova_aba = lambda: wb.create_sheet()
+        escrever = lambda ws, linha, valores: ws.append(valores)
+
+    ws, linha, cabecalho = None, 0, None
+    for lote in lotes:
+        if cabecalho is None:
+            cabecalho = list(lote.columns)
+        valores = lote.astype(object).where(lote.notna(), None)
+        for registro in valores.itertuples(index=False, name=None):
+            if ws is None or linha >= LIMITE_LINHAS_XLSX:
+                ws, linha = nova_aba(), 0
+                escrever(ws, linha, cabecalho)
+                linha += 1
+            escrever(ws, linha, registro)
+            linha += 1
+    if ws is None:
+        ws = nova_aba()
+        escrever(ws, 0, cabecalho or [])
+
+    if xlsxwriter is not None:
+        wb.close()
+    else:
+        wb.save(destino)
+
+def estatisticas_cache():
+    with _cache_lock:
+        total = _cache_stats["hits"] + _cache_stats["misses"]
+        return {**_cache_stats, "entradas": len(_cache_planilhas),
+                "hit_rate": _cache_stats["hits"] / total if total else 0.0}
+
+def limpar_cache():
+    with _cache_lock:
+        _cache_planilhas.clear()
+        _cache_stats.update(hits=0, misses=0, evictions=0, bytes=0)
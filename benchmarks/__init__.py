@@ -0,0 +1,2 @@
+# Benchmarks do pipeline do dashboard (leitura, extração, agregação, serialização).
+# Uso: python -m benchmarks.executar --eventos 1000 10000 100000
@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+import plotly
+import plotly.express as px
+
+import backend
+from benchmarks.gerador import gerar_planilha, salvar_planilha
+
+# Mede cada etapa do pipeline separadamente sobre planilhas sintéticas e grava
+# os tempos em JSON para comparar execuções (ex.: antes/depois de uma mudança).
+
+MODOS = {
+    "colunas_tags_semana": backend.resumo_semanal,
+    "rosquinha_multi": backend.resumo_usuarios,
+    "colunas_dias": backend.resumo_diario,
+    "rosquinha_tags": backend.resumo_tags,
+}
+
+def cronometrar(funcao, repeticoes):
+    tempos, resultado = [], None
+    for _ in range(repeticoes):
+        t = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - t)
+    return resultado, tempos
+
+def _figura(modo, tabela):
+    if modo == "colunas_tags_semana": return px.bar(tabela, x="semana", y="tags_unicas")
+    if modo == "rosquinha_multi": return px.pie(tabela, names="nome", values="total_alt", hole=0.4)
+    if modo == "colunas_dias": return px.bar(tabela, x="data", y="total_alteracoes")
+    return px.bar(tabela, x="TAG", y="Total")
+
+def medir(n_eventos, repeticoes, ler_xlsx, legado, pasta):
+    df = gerar_planilha(n_eventos)
+    etapas = []
+
+    def registrar(etapa, funcao, reps=repeticoes):
+        resultado, tempos = cronometrar(funcao, reps)
+        etapas.append({"etapa": etapa, "min_s": min(tempos), "mediana_s": statistics.median(tempos), "repeticoes": len(tempos)})
+        return resultado
+
+    if ler_xlsx:
+        caminho = salvar_planilha(df, os.path.join(pasta, f"sintetica_{n_eventos}.xlsx"))
+        df = registrar("leitura_xlsx", lambda: backend.ler_planilha(caminho), reps=1)
+    if legado:
+        registrar("extracao_legado", lambda: pd.concat([d for d in (backend.extrair_info(df, c) for c in backend.COLUNAS_MULTIPLAS) if not d.empty], ignore_index=True))
+    eventos = registrar("extracao", lambda: backend.extrair_eventos(df))
+    equip = backend.dimensao_equipamentos(df)
+    registrar("juncao_tag", lambda: backend.atributos_equipamento(equip, eventos["index_base"], ["TAG"]))
+    cubo = registrar("cubo", lambda: backend.montar_cubo(equip, eventos))
+    filtrado = backend.filtrar_cubo(cubo)
+    for modo, resumo in MODOS.items():
+        tabela = registrar(f"agregacao_{modo}", lambda: resumo(filtrado))
+        registrar(f"serializacao_tabela_{modo}", lambda: json.dumps(tabela.to_dict("records"), default=str))
+        figura = registrar(f"figura_{modo}", lambda: _figura(modo, tabela))
+        registrar(f"serializacao_figura_{modo}", lambda: json.dumps(figura, cls=plotly.utils.PlotlyJSONEncoder))
+
+    return {"eventos_solicitados": n_eventos, "eventos": len(eventos), "linhas_planilha": len(df), "etapas": etapas}
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline do dashboard com planilhas sintéticas.")
+    parser.add_argument("--eventos", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="Quantidade de eventos por planilha (até 1M)")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--sem-xlsx", action="store_true", help="Não grava/lê o .xlsx (pula a etapa de leitura)")
+    parser.add_argument("--legado", action="store_true", help="Mede também a extração coluna a coluna (extrair_info)")
+    parser.add_argument("--saida", default=os.path.join("benchmarks", "resultados", f"{datetime.now():%Y%m%d-%H%M%S}.json"))
+    args = parser.parse_args(argv)
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        for n in args.eventos:
+            resultado = medir(n, args.repeticoes, not args.sem_xlsx, args.legado, pasta)
+            resultados.append(resultado)
+            for e in resultado["etapas"]:
+                print(f"{n:>9} {e['etapa']:<45} {e['mediana_s'] * 1000:10.1f} ms")
+
+    saida = {
+        "meta": {"data": datetime.now().isoformat(timespec="seconds"), "commit": _commit_atual(), "python": sys.version.split()[0],
+                 "pandas": pd.__version__, "plataforma": platform.platform(), "repeticoes": args.repeticoes},
+        "resultados": resultados,
+    }
+    os.makedirs(os.path.dirname(args.saida) or ".", exist_ok=True)
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(saida, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {args.saida}")
+
+if __name__ == "__main__":
+    main()
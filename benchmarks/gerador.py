@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+from backend import COLUNAS_MULTIPLAS
+
+# Gera planilhas sintéticas no formato das bases das unidades: cadastro do
+# equipamento (TAG/Área/Tipo/Sistema), colunas de resposta e colunas de
+# monitoramento com "nome - dd/mm/aaaa HH:MM:SS".
+
+USUARIOS = [
+    "Ana Paula Souza", "Bruno Henrique Lima", "Carlos Eduardo Rocha", "Daniela Ferreira", "Eduardo Martins",
+    "Fernanda Alves", "Gustavo Pereira", "Juliana Costa", "Luis Carlos De Oliveira Filho", "Mariana Ribeiro",
+    "Paulo Roberto Dias", "Rafael Gomes", "Sandra Mendes", "Uanderson Dos Santos Rocha", "Vinicius Barbosa",
+]
+AREAS = ["10&20 - R.P.E - Moenda 1", "10&20 - R.P.E - Moenda 2", "30 - Tratamento de Caldo", "40 - Fábrica de Açúcar",
+         "50 - Destilaria", "60 - Caldeiras", "70 - Utilidades"]
+TIPOS = ["Transmissor", "Controlador", "Indicador", "Válvula Pneumatica", "Motor", "Bomba", "Chave de Nível"]
+SISTEMAS = ["1º Terno", "2º Terno", "Peneira Rotativa", "Aquecedor De Caldo Misto", "Decantador", "Evaporação",
+            "Turbina 3º E 4º Ternos", "Torre de Resfriamento"]
+
+def _colunas_log():
+    return ["Imagem do Equipamento Registrada em:" if c == "Imagem Registrada:" else c for c in COLUNAS_MULTIPLAS]
+
+def gerar_planilha(n_eventos, eventos_por_linha=20, inicio="2026-01-05", dias=180, fracao_fora_layout=0.005, semente=0):
+    rng = np.random.default_rng(semente)
+    colunas_log = _colunas_log()
+    n_linhas = max(-(-n_eventos // eventos_por_linha), 1)
+    celulas = rng.choice(n_linhas * len(colunas_log), size=min(n_eventos, n_linhas * len(colunas_log)), replace=False)
+    linhas, cols = np.divmod(celulas, len(colunas_log))
+
+    segundos = rng.integers(0, dias * 86400, size=len(celulas))
+    datahora = pd.Timestamp(inicio) + pd.to_timedelta(segundos, unit="s")
+    usuarios = np.array(USUARIOS, dtype=object)[rng.integers(0, len(USUARIOS), size=len(celulas))]
+    textos = usuarios + " - " + pd.DatetimeIndex(datahora).strftime("%d/%m/%Y %H:%M:%S").to_numpy(dtype=object)
+    # Uma pequena parte fora do layout fixo (texto extra / quebra de linha), como acontece nas bases reais
+    fora = rng.random(len(celulas)) < fracao_fora_layout
+    textos[fora] = textos[fora] + np.where(rng.random(int(fora.sum())) < 0.5, " (editado)", "\nrevisado")
+
+    df = pd.DataFrame({
+        "Área": np.array(AREAS, dtype=object)[rng.integers(0, len(AREAS), size=n_linhas)],
+        "Sistema": np.array(SISTEMAS, dtype=object)[rng.integers(0, len(SISTEMAS), size=n_linhas)],
+        "Tipo": np.array(TIPOS, dtype=object)[rng.integers(0, len(TIPOS), size=n_linhas)],
+        "TAG": [f"TAG-{i // 1000:02d}-{i % 1000:03d}" for i in range(n_linhas)],
+        "Descrição": "Equipamento sintético",
+    })
+    grade = np.full((n_linhas, len(colunas_log)), None, dtype=object)
+    grade[linhas, cols] = textos
+    blocos = {}
+    for j, coluna in enumerate(colunas_log):
+        if coluna.endswith(" [Monitoramento]"):
+            # Coluna de resposta ao lado do log, como nas planilhas reais
+            blocos[coluna.replace(" [Monitoramento]", "")] = np.where(pd.isna(grade[:, j]), None, "Sim")
+        blocos[coluna] = grade[:, j]
+    return pd.concat([df, pd.DataFrame(blocos)], axis=1)
+
+def salvar_planilha(df, caminho):
+    import openpyxl
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(list(df.columns))
+    for registro in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+        ws.append(registro)
+    wb.save(caminho)
+    return caminho
@@ -0,0 +1,67 @@
+import argparse
+import sys
+
+import pandas as pd
+
+import backend
+from benchmarks.gerador import gerar_planilha
+
+# Confere a extração em lote (extrair_eventos) contra a original coluna a coluna
+# (extrair_info) numa planilha sintética com textos fora do layout fixo
+# misturados aos normais: fuso horário, separadores trocados, datas inválidas,
+# dígitos não ASCII, texto extra e quebra de linha. Os dois caminhos têm que
+# aceitar e descartar exatamente as mesmas células.
+#
+#     python -m benchmarks.verificar_extracao --eventos 20000
+
+ESTRANHOS = [
+    "Ana - 01/02/2026 10:00-03",
+    "Ana - 01/02/2026 1:00:00Z",
+    "Ana - 01/02/2026 10:00:00Z",
+    "Ana - 01/02/2026T10:00:00",
+    "Ana - 01/02/2026+10:00:00",
+    "Ana - 2026-02-01 10:00:00",
+    "Ana - 31/02/2026 10:00:00",
+    "Ana - 01/13/2026 10:00:00",
+    "Ana - 01/02/2026 24:00:00",
+    "Ana - ０1/02/2026 10:00:00",
+    " - 01/02/2026 10:00:00",
+    "Ana-01/02/2026 10:00:00",
+    "Ana - 01/02/2026 10:00:00 (editado)",
+    "Ana - 01/02/2026 10:00:00\nrevisado",
+    "Ana\nSouza - 01/02/2026 10:00:00",
+    "Ana - Bia - 01/02/2026 10:00:00",
+    "Sem data nenhuma",
+]
+
+def _normalizar(df):
+    colunas = ["index_base", "alterado_no_momento", "datahora", "nome", "data", "hora", "semana"]
+    df = df[colunas].astype({"index_base": "int64", "nome": str, "hora": str, "semana": str, "alterado_no_momento": str})
+    df = df.astype({"datahora": "datetime64[ns]", "data": "datetime64[ns]"})
+    return df.sort_values(colunas[:4], kind="stable").reset_index(drop=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Confere extrair_eventos contra extrair_info, com textos fora do layout.")
+    parser.add_argument("--eventos", type=int, default=20_000)
+    args = parser.parse_args(argv)
+
+    df = gerar_planilha(args.eventos)
+    coluna = "Última atualização:"
+    df[coluna] = df[coluna].astype(object)
+    # Um de cada texto estranho a cada 7 linhas, no meio das células normais
+    for i, texto in enumerate(ESTRANHOS * max(len(df) // (7 * len(ESTRANHOS)), 1)):
+        df.loc[(i * 7) % len(df), coluna] = texto
+
+    original = [d for d in (backend.extrair_info(df, c) for c in backend.COLUNAS_MULTIPLAS) if not d.empty]
+    esperado = _normalizar(pd.concat(original, ignore_index=True))
+    obtido = _normalizar(backend.expandir_eventos(backend.extrair_eventos(df)))
+    pd.testing.assert_frame_equal(esperado, obtido)
+
+    sozinhos = pd.DataFrame({coluna: ESTRANHOS})
+    aceitos = backend.extrair_info(sozinhos, coluna)
+    pd.testing.assert_frame_equal(_normalizar(aceitos), _normalizar(backend.expandir_eventos(backend.extrair_eventos(sozinhos))))
+    print(f"{len(obtido)} eventos iguais; textos estranhos aceitos: {sorted(aceitos.index)} de {len(ESTRANHOS)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import argparse
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+import backend
+import metricas
+from benchmarks.gerador import gerar_planilha, salvar_planilha
+
+# Confere o reprocessamento incremental (reaproveitar_eventos + atualizar_cubo)
+# contra um processamento completo: cada rodada grava uma versão nova das
+# planilhas com linhas alteradas, removidas, inseridas no meio e acrescentadas no
+# fim, e compara eventos e cubos (por arquivo e consolidado) com os montados do
+# zero. Termina com erro na primeira diferença.
+#
+#     python -m benchmarks.verificar_incremental --eventos 20000 --rodadas 3
+
+COLUNA_LOG = "Última atualização:"
+
+def alterar(df, rodada):
+    # Versão nova da planilha: edita, remove, insere no meio e acrescenta no fim
+    df = df.copy()
+    n = len(df)
+    df.loc[5 % n, COLUNA_LOG] = f"Fulano Novo - 1{rodada}/10/2026 08:00:00"
+    df.loc[(7 + rodada) % n, COLUNA_LOG] = None
+    df = df.drop(index=df.index[10:13])
+    nova = df.iloc[[30 % len(df)]].assign(TAG=f"TAG-NOVA-{rodada}", **{COLUNA_LOG: f"Beltrano - 1{rodada}/10/2026 09:30:00"})
+    copia = df.iloc[[20 % len(df)]]
+    df = pd.concat([df.iloc[:20], copia, nova, df.iloc[20:], df.iloc[[40 % len(df)]]], ignore_index=True)
+    return df
+
+def _comparavel(cubo):
+    saida = {}
+    for nome, df in cubo.items():
+        df = df.copy()
+        for coluna in df.columns:
+            if isinstance(df[coluna].dtype, pd.CategoricalDtype):
+                df[coluna] = df[coluna].astype(object)
+            if coluna in backend.COLUNAS_CONJUNTO:
+                df[coluna] = df[coluna].map(lambda s: tuple(sorted(map(str, s))))
+        saida[nome] = df
+    return saida
+
+def comparar_cubos(esperado, obtido):
+    esperado, obtido = _comparavel(esperado), _comparavel(obtido)
+    for nome in esperado:
+        pd.testing.assert_frame_equal(esperado[nome], obtido[nome], check_dtype=False)
+
+def conferir(arquivos):
+    for arquivo in arquivos:
+        df_equip, df_eventos = backend.carregar_planilha(arquivo)
+        completo = backend._ordenar_eventos(backend.extrair_eventos(backend.ler_planilha(os.path.join(backend.CAMINHO_PLANILHAS, arquivo))))
+        pd.testing.assert_frame_equal(completo, df_eventos)
+        comparar_cubos(backend.montar_cubo(df_equip, completo), backend.carregar_cubo([arquivo]))
+    comparar_cubos(backend.montar_cubo(*backend.carregar_planilhas(arquivos)), backend.carregar_cubo(arquivos))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Confere o reprocessamento incremental contra o processamento completo.")
+    parser.add_argument("--eventos", type=int, default=20_000, help="Eventos por planilha sintética")
+    parser.add_argument("--rodadas", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    origem = os.getcwd()
+    with tempfile.TemporaryDirectory() as raiz:
+        # Caminhos relativos padrão do backend, também nos processos do pool
+        os.chdir(raiz)
+        try:
+            pasta = backend.CAMINHO_PLANILHAS
+            os.makedirs(pasta)
+            planilhas = {"A.xlsx": gerar_planilha(args.eventos, semente=1), "B.xlsx": gerar_planilha(args.eventos // 2, semente=2)}
+            for nome, df in planilhas.items():
+                salvar_planilha(df, os.path.join(pasta, nome))
+            arquivos = sorted(planilhas)
+            backend.carregar_cubo(arquivos)
+
+            for rodada in range(1, args.rodadas + 1):
+                # Rodadas ímpares mudam só A (um arquivo, no processo); pares mudam as duas
+                # e começam pelo cubo consolidado (pool de processos)
+                alteradas = arquivos if rodada % 2 == 0 else arquivos[:1]
+                for nome in alteradas:
+                    planilhas[nome] = alterar(planilhas[nome], rodada)
+                    salvar_planilha(planilhas[nome], os.path.join(pasta, nome))
+                if rodada % 2 == 0:
+                    backend.carregar_cubo(arquivos)
+                conferir(arquivos)
+                print(f"rodada {rodada}: {', '.join(alteradas)} iguais ao processamento completo")
+        finally:
+            os.chdir(origem)
+
+    incrementais = {m["nome"]: m["total"] for m in metricas.resumo() if m["nome"].endswith("_incremental")}
+    print("execuções incrementais:", incrementais)
+    # Nas rodadas pares a extração roda nos processos do pool e não entra nessa conta
+    if not incrementais.get("extracao_incremental") or not incrementais.get("cubo_incremental"):
+        print("o caminho incremental não foi exercitado", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 from dash import dcc, html, dash_table
+from metricas import PAINEL_METRICAS
 
 # Definição do Layout
 layout = html.Div(
@@ -8,7 +9,9 @@ layout = html.Div(
 
         html.Div([
             html.Label("1. Selecione o Arquivo:"),
-            dcc.Dropdown(id="arquivo_excel"),
+            dcc.Dropdown(id="arquivo_excel", multi=True, placeholder="Selecione uma ou mais unidades"),
+            # Atualiza as opções quando planilhas entram ou saem da pasta (ver observador.py)
+            dcc.Interval(id="intervalo_arquivos", interval=5000),
         ], style={"width": "400px", "marginBottom": "10px"}),
 
         html.Div([
@@ -43,6 +46,10 @@ layout = html.Div(
             ),
         ], style={"width": "400px", "marginBottom": "20px"}),
 
+        # Estado intermediário do pipeline de callbacks (ver app.py)
+        dcc.Store(id="store_selecao"),
+        dcc.Store(id="store_agregado"),
+
         dcc.Graph(id="grafico"),
 
         html.H4("Resumo de Alterações por TAG", id="titulo_tags", style={"marginTop": "30px"}),
@@ -51,12 +58,19 @@ layout = html.Div(
             style_table={'overflowX': 'auto', 'width': '50%'},
             style_cell={'textAlign': 'center', 'padding': '10px'},
             style_header={'fontWeight': 'bold', 'backgroundColor': '#f2f2f2'},
-            page_size=10,
-            sort_action="native"
+            page_action="custom", page_current=0, page_size=10,
+            sort_action="custom", sort_mode="multi", sort_by=[],
+            filter_action="custom", filter_query=""
         ),
 
         html.H4("Resumo Dinâmico", id="titulo_resumo", style={"marginTop": "30px"}),
-        dash_table.DataTable(id="tabela_resumo_dinamico", style_table={'overflowX': 'auto'}, sort_action="native"),
+        dash_table.DataTable(
+            id="tabela_resumo_dinamico",
+            style_table={'overflowX': 'auto'},
+            page_action="custom", page_current=0, page_size=15,
+            sort_action="custom", sort_mode="multi", sort_by=[],
+            filter_action="custom", filter_query=""
+        ),
         
         html.Div(id="container_soma_total", style={"marginTop": "10px", "width": "450px"}, children=[
             dash_table.DataTable(
@@ -72,14 +86,36 @@ layout = html.Div(
             style_table={'overflowX': 'auto'},
             style_cell={'textAlign': 'left', 'padding': '10px'},
             style_header={'fontWeight': 'bold'},
-            sort_action="native"
+            page_action="custom", page_current=0, page_size=20,
+            sort_action="custom", sort_mode="multi", sort_by=[],
+            filter_action="custom", filter_query=""
         ),
 
         html.Br(),
-        html.Button("Exportar CSV", id="btn_exportar", style={
-            "marginTop": "20px", "padding": "10px 20px", "backgroundColor": "#28a745", 
-            "color": "white", "borderRadius": "5px", "cursor": "pointer"
-        }),
-        dcc.Download(id="download_dataframe_csv"),
-    ]
+        html.Div([
+            dcc.RadioItems(
+                id="formato_exportacao",
+                options=[
+                    {"label": "CSV", "value": "csv"},
+                    {"label": "CSV compactado (.gz)", "value": "csv.gz"},
+                    {"label": "Excel (.xlsx)", "value": "xlsx"},
+                ],
+                value="csv",
+                inline=True,
+                inputStyle={"marginLeft": "10px", "marginRight": "4px"}
+            ),
+            # Link para a rota /exportar (download em streaming, ver app.py)
+            html.A(html.Button("Exportar", id="btn_exportar", style={
+                "marginTop": "10px", "padding": "10px 20px", "backgroundColor": "#28a745", 
+                "color": "white", "borderRadius": "5px", "cursor": "pointer"
+            }), id="link_exportar", download=""),
+        ], style={"marginTop": "20px"}),
+    ] + ([
+        # Painel de depuração (DASHBOARD_PAINEL_METRICAS=1): latências do /metrics em tabela
+        html.Details([
+            html.Summary("Métricas de desempenho"),
+            html.Pre(id="painel_metricas", style={"fontSize": "12px"}),
+            dcc.Interval(id="intervalo_metricas", interval=5000),
+        ], style={"marginTop": "30px"}),
+    ] if PAINEL_METRICAS else [])
 )
\ No newline at end of file
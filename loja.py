@@ -0,0 +1,88 @@
+import os
+import json
+import shutil
+import pandas as pd
+
+# Loja compartilhada entre processos (gunicorn com vários workers): um único
+# processo carregador (DASHBOARD_LOJA=carregador, ver observador.py) processa as
+# planilhas e publica as tabelas como arquivos Arrow IPC sem compressão, em um
+# bloco só. Os workers (DASHBOARD_LOJA=leitor) abrem esses arquivos via
+# memory-map e montam os DataFrames sem copiar as colunas numéricas, de data e
+# os códigos das categóricas: a memória das páginas é a mesma em todos eles.
+#
+# Cada versão vai para um diretório próprio e imutável; o ponteiro "atual.json"
+# é trocado atomicamente (os.replace) depois que a versão está completa, então o
+# leitor vê a versão antiga ou a nova, nunca uma mistura. Versões anteriores à
+# penúltima são apagadas (quem ainda as tem mapeadas continua lendo: o arquivo
+# só some do disco quando o último mapeamento é fechado).
+
+MODO_LOJA = os.environ.get("DASHBOARD_LOJA", "")
+CAMINHO_LOJA = os.environ.get("DASHBOARD_LOJA_CAMINHO", os.path.join("planilhas", ".cache", "loja"))
+ESPERA_LOJA = float(os.environ.get("DASHBOARD_LOJA_ESPERA", "30"))
+
+def _pasta(nome):
+    # Nome do item -> diretório (sem separadores de caminho)
+    return os.path.join(CAMINHO_LOJA, "".join(c if c.isalnum() or c in " ().-_" else "_" for c in nome))
+
+def versao_publicada(nome):
+    try:
+        with open(os.path.join(_pasta(nome), "atual.json"), encoding="utf-8") as f:
+            return json.load(f).get("versao")
+    except (OSError, ValueError):
+        return None
+
+def publicar(nome, versao, tabelas):
+    import pyarrow.feather as feather
+    pasta = _pasta(nome)
+    destino = os.path.join(pasta, versao)
+    temporario = destino + ".tmp"
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+    for tabela, df in tabelas.items():
+        feather.write_feather(df, os.path.join(temporario, tabela + ".arrow"), compression="uncompressed",
+                              chunksize=max(len(df), 1))
+    if os.path.isdir(destino):
+        shutil.rmtree(temporario)
+    else:
+        os.rename(temporario, destino)
+    anterior = versao_publicada(nome)
+    with open(os.path.join(pasta, "atual.json.tmp"), "w", encoding="utf-8") as f:
+        json.dump({"versao": versao, "tabelas": sorted(tabelas)}, f)
+    os.replace(os.path.join(pasta, "atual.json.tmp"), os.path.join(pasta, "atual.json"))
+    for antiga in os.listdir(pasta):
+        if antiga not in (versao, anterior, "atual.json") and os.path.isdir(os.path.join(pasta, antiga)):
+            shutil.rmtree(os.path.join(pasta, antiga), ignore_errors=True)
+
+def _coluna_sem_copia(coluna):
+    import pyarrow as pa
+    if coluna.num_chunks != 1 or coluna.null_count:
+        return coluna.to_pandas()
+    bloco = coluna.chunk(0)
+    try:
+        if pa.types.is_dictionary(bloco.type):
+            codigos = bloco.indices.to_numpy(zero_copy_only=True)
+            return pd.Categorical.from_codes(codigos, bloco.dictionary.to_pandas(), validate=False)
+        return bloco.to_numpy(zero_copy_only=True)
+    except (pa.ArrowInvalid, ValueError, TypeError):
+        return coluna.to_pandas()
+
+def _tabela_sem_copia(caminho):
+    import pyarrow.feather as feather
+    tabela = feather.read_table(caminho, memory_map=True)
+    if tabela.num_rows == 0:
+        return tabela.to_pandas()
+    return pd.DataFrame({n: _coluna_sem_copia(tabela.column(n)) for n in tabela.column_names}, copy=False)
+
+def anexar(nome, versao):
+    # DataFrames somente leitura da versão pedida, ou None se ela não é a atual
+    for _ in range(3):
+        if versao_publicada(nome) != versao:
+            return None
+        pasta = os.path.join(_pasta(nome), versao)
+        try:
+            arquivos = [a for a in os.listdir(pasta) if a.endswith(".arrow")]
+            return {a[:-len(".arrow")]: _tabela_sem_copia(os.path.join(pasta, a)) for a in arquivos}
+        except (OSError, ValueError):
+            # Ponteiro trocado entre a leitura e a abertura: confere de novo
+            continue
+    return None
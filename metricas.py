@@ -0,0 +1,99 @@
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+# Instrumentação leve do pipeline: histogramas de latência por etapa (leitura,
+# extração, junção, agregação, figura, serialização) e por callback do Dash.
+# Com DASHBOARD_METRICAS=0 os decoradores devolvem a função original e medir()
+# vira um nullcontext, então o custo desligado é praticamente zero.
+
+METRICAS_ATIVAS = os.environ.get("DASHBOARD_METRICAS", "1") == "1"
+PAINEL_METRICAS = os.environ.get("DASHBOARD_PAINEL_METRICAS", "0") == "1"
+
+LIMITES_HISTOGRAMA = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+JANELA_RECENTE = 512
+
+_series = {}
+_lock = threading.Lock()
+
+def _nova_serie():
+    return {"buckets": [0] * len(LIMITES_HISTOGRAMA), "soma": 0.0, "total": 0, "recentes": deque(maxlen=JANELA_RECENTE)}
+
+def registrar(nome, segundos, tipo="etapa"):
+    with _lock:
+        serie = _series.get((tipo, nome))
+        if serie is None:
+            serie = _series[(tipo, nome)] = _nova_serie()
+        for i, limite in enumerate(LIMITES_HISTOGRAMA):
+            if segundos <= limite:
+                serie["buckets"][i] += 1
+                break
+        serie["soma"] += segundos
+        serie["total"] += 1
+        serie["recentes"].append(segundos)
+
+@contextmanager
+def _medir(nome, tipo):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(nome, time.perf_counter() - inicio, tipo)
+
+def medir(nome, tipo="etapa"):
+    return _medir(nome, tipo) if METRICAS_ATIVAS else nullcontext()
+
+def cronometrado(nome, tipo="etapa"):
+    def decorador(funcao):
+        if not METRICAS_ATIVAS:
+            return funcao
+        @wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with _medir(nome, tipo):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+def _quantil(valores, q):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(int(q * len(ordenados)), len(ordenados) - 1)]
+
+def resumo():
+    with _lock:
+        copia = {k: (s["total"], s["soma"], list(s["recentes"])) for k, s in _series.items()}
+    linhas = []
+    for (tipo, nome), (total, soma, recentes) in sorted(copia.items()):
+        linhas.append({"tipo": tipo, "nome": nome, "total": total, "media_ms": soma / total * 1000 if total else 0.0,
+                       "p50_ms": _quantil(recentes, 0.5) * 1000, "p95_ms": _quantil(recentes, 0.95) * 1000})
+    return linhas
+
+def texto_prometheus(extras=None):
+    with _lock:
+        copia = {k: (list(s["buckets"]), s["soma"], s["total"]) for k, s in _series.items()}
+    saida = []
+    for tipo, rotulo, descricao in (("etapa", "etapa", "Latência por etapa do pipeline"),
+                                    ("callback", "callback", "Latência por callback do Dash")):
+        metrica = f"dashboard_{tipo}_segundos"
+        saida += [f"# HELP {metrica} {descricao}", f"# TYPE {metrica} histogram"]
+        for (t, nome), (buckets, soma, total) in sorted(copia.items()):
+            if t != tipo:
+                continue
+            acumulado = 0
+            for limite, qtd in zip(LIMITES_HISTOGRAMA, buckets):
+                acumulado += qtd
+                saida.append(f'{metrica}_bucket{{{rotulo}="{nome}",le="{limite}"}} {acumulado}')
+            saida.append(f'{metrica}_bucket{{{rotulo}="{nome}",le="+Inf"}} {total}')
+            saida.append(f'{metrica}_sum{{{rotulo}="{nome}"}} {soma}')
+            saida.append(f'{metrica}_count{{{rotulo}="{nome}"}} {total}')
+    for metrica, (tipo_metrica, descricao, valor) in (extras or {}).items():
+        saida += [f"# HELP {metrica} {descricao}", f"# TYPE {metrica} {tipo_metrica}", f"{metrica} {valor}"]
+    return "\n".join(saida) + "\n"
+
+def limpar():
+    with _lock:
+        _series.clear()
@@ -0,0 +1,142 @@
+import os
+import logging
+import threading
+import backend
+import loja
+
+# Observador da pasta de planilhas: um thread em segundo plano acompanha
+# CAMINHO_PLANILHAS (inotify via watchdog quando instalado, senão varredura
+# periódica de mtime/tamanho). Planilhas novas ou alteradas são processadas e
+# pré-agregadas por backend.preaquecer() num pool de processos limitado, então
+# as requisições já encontram o cache quente. Um arquivo só é processado depois
+# de duas varreduras seguidas com a mesma assinatura (cópia terminada).
+#
+# Em implantação com vários workers o observador roda num processo próprio,
+# que publica as tabelas na loja compartilhada (loja.py):
+#     python -m observador                            (carregador)
+#     DASHBOARD_LOJA=leitor gunicorn -w 4 app:server  (workers)
+
+OBSERVADOR_ATIVO = os.environ.get("DASHBOARD_OBSERVADOR", "1") == "1"
+INTERVALO_VARREDURA = float(os.environ.get("DASHBOARD_INTERVALO_VARREDURA", "5"))
+INTERVALO_ESTABILIZACAO = 1.0
+MAX_PROCESSOS_PREAQUECIMENTO = int(os.environ.get("DASHBOARD_PREAQUECIMENTO_PROCESSOS", "2"))
+
+log = logging.getLogger(__name__)
+
+_estado = {"assinaturas": {}, "candidatos": {}, "versao": 0, "preaquecidas": 0, "falhas": 0, "com_falha": set(), "modo": None}
+_lock = threading.Lock()
+_acordar = threading.Event()
+_thread = None
+
+def _assinaturas():
+    assinaturas = {}
+    try:
+        entradas = list(os.scandir(backend.CAMINHO_PLANILHAS))
+    except OSError:
+        return assinaturas
+    for entrada in entradas:
+        if entrada.name.endswith(".xlsx") and not entrada.name.startswith("~$"):
+            try:
+                st = entrada.stat()
+            except OSError:
+                continue
+            assinaturas[entrada.name] = (st.st_mtime_ns, st.st_size)
+    return assinaturas
+
+def varrer():
+    # Planilhas prontas para pré-aquecer (novas/alteradas e estáveis) e removidas
+    atuais = _assinaturas()
+    with _lock:
+        conhecidas, candidatos = _estado["assinaturas"], _estado["candidatos"]
+        prontas = [a for a, sig in atuais.items() if conhecidas.get(a) != sig and candidatos.get(a) == sig]
+        _estado["candidatos"] = {a: sig for a, sig in atuais.items() if conhecidas.get(a) != sig and a not in prontas}
+        removidas = [a for a in conhecidas if a not in atuais]
+        for arquivo in removidas:
+            del conhecidas[arquivo]
+        if prontas or removidas:
+            _estado["versao"] += 1
+    return prontas, removidas, atuais
+
+def _preaquecer_lote(prontas):
+    # Devolve as planilhas que falharam (corrompidas ou removidas no meio)
+    try:
+        backend.preaquecer(prontas, MAX_PROCESSOS_PREAQUECIMENTO)
+        if loja.MODO_LOJA == "carregador":
+            for arquivo in prontas:
+                backend.publicar_planilha(arquivo)
+        return set()
+    except Exception:
+        if len(prontas) == 1:
+            log.exception("Falha ao pré-aquecer %s", prontas[0])
+            return set(prontas)
+    # Isola a planilha com problema processando uma a uma
+    return set().union(*(_preaquecer_lote([a]) for a in prontas))
+
+def _preaquecer(prontas, atuais):
+    falhas = _preaquecer_lote(prontas)
+    with _lock:
+        # Com falha a assinatura também é registrada: só tenta de novo se o arquivo mudar
+        for arquivo in prontas:
+            _estado["assinaturas"][arquivo] = atuais[arquivo]
+        _estado["com_falha"] = ((_estado["com_falha"] - set(prontas)) | falhas) & set(atuais)
+        _estado["preaquecidas"] += len(prontas) - len(falhas)
+        _estado["falhas"] += len(falhas)
+        consolidar = len(atuais) > 1 and not _estado["com_falha"]
+    if consolidar:
+        try:
+            backend.carregar_cubo(list(atuais))
+        except Exception:
+            log.exception("Falha ao pré-agregar o consolidado")
+
+def _iniciar_inotify():
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        return None
+
+    class Acordar(FileSystemEventHandler):
+        def on_any_event(self, evento):
+            if str(evento.src_path).endswith(".xlsx") or str(getattr(evento, "dest_path", "")).endswith(".xlsx"):
+                _acordar.set()
+
+    observer = Observer()
+    observer.schedule(Acordar(), backend.CAMINHO_PLANILHAS, recursive=False)
+    observer.daemon = True
+    observer.start()
+    return observer
+
+def _laco():
+    while True:
+        prontas, removidas, atuais = varrer()
+        if prontas or removidas:
+            # Remoção também muda o consolidado ("Todas as unidades")
+            _preaquecer(prontas, atuais)
+        with _lock:
+            aguardando = bool(_estado["candidatos"])
+        # Com arquivo em cópia a próxima varredura vem logo, para confirmar a assinatura
+        _acordar.wait(INTERVALO_ESTABILIZACAO if aguardando else INTERVALO_VARREDURA)
+        _acordar.clear()
+
+def iniciar_observador():
+    global _thread
+    if _thread is not None:
+        return
+    with _lock:
+        if _thread is not None:
+            return
+        _estado["modo"] = "inotify" if _iniciar_inotify() is not None else "varredura"
+        _thread = threading.Thread(target=_laco, name="observador-planilhas", daemon=True)
+        _thread.start()
+
+def estado_observador():
+    with _lock:
+        return {"modo": _estado["modo"], "versao": _estado["versao"], "preaquecidas": _estado["preaquecidas"],
+                "falhas": _estado["falhas"], "pendentes": len(_estado["candidatos"])}
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    loja.MODO_LOJA = "carregador"
+    iniciar_observador()
+    log.info("Carregador publicando em %s", loja.CAMINHO_LOJA)
+    _thread.join()